@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Reports the memory allocated per SCP v2 chunk while a search command reads its records.
+
+Chunks are read once as before, with the body returned as bytes, and once into a reusable ChunkBuffer. For every chunk
+the peak of traced allocations while reading and decoding it is printed, along with the size of its body.
+
+    python benchmarks/chunk_allocations.py --chunks 5 --records 50000
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+from splunklib.searchcommands import StreamingCommand
+from splunklib.searchcommands.internals import ChunkBuffer
+
+
+def make_input(chunks, records):
+    data = io.BytesIO()
+    for index in range(chunks):
+        body = io.StringIO()
+        writer = csv.writer(body, lineterminator='\r\n')
+        writer.writerow(['_time', 'host', 'source', '_raw', '__mv_tag', 'tag'])
+        for record in range(records):
+            writer.writerow([
+                str(1700000000 + record), 'host{}'.format(record % 17), '/var/log/app.log',
+                'level=INFO user=u{} action=login status=200 ä'.format(record), '$a$;$b$', ''
+            ])
+        body = body.getvalue().encode('utf-8')
+        metadata = json.dumps({'action': 'execute', 'finished': index == chunks - 1}).encode('utf-8')
+        data.write(b'chunked 1.0,%d,%d\n' % (len(metadata), len(body)))
+        data.write(metadata)
+        data.write(body)
+    return data.getvalue()
+
+
+def measure(command, data, buffer):
+    istream = io.BytesIO(data)
+    results = []
+
+    tracemalloc.start()
+    try:
+        while True:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+            result = command._read_chunk(istream, buffer)
+            if not result:
+                break
+
+            metadata, body = result
+            size = len(body)
+            count = sum(1 for _ in command._read_csv_records(command._as_text_stream(body)))
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            results.append((size, count, peak))
+
+            del result, metadata, body
+    finally:
+        tracemalloc.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--chunks', type=int, default=5)
+    parser.add_argument('--records', type=int, default=50000, help='records per chunk')
+    args = parser.parse_args()
+
+    data = make_input(args.chunks, args.records)
+    command = StreamingCommand()
+
+    unbuffered = measure(command, data, None)
+    buffered = measure(command, data, ChunkBuffer())
+
+    print('{:>5} {:>10} {:>8} {:>14} {:>14}'.format('chunk', 'body KiB', 'records', 'peak KiB', 'buffered KiB'))
+    for index, ((size, count, peak), (_, _, buffered_peak)) in enumerate(zip(unbuffered, buffered)):
+        print('{:>5} {:>10.0f} {:>8} {:>14.0f} {:>14.0f}'.format(
+            index, size / 1024, count, peak / 1024, buffered_peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
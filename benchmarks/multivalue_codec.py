@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Compares the __mv_ multivalue codec with the regular expression based implementation it replaced.
+
+Lists of a few typical sizes are encoded and decoded with both implementations. The best of several timeit runs is
+reported in microseconds per list.
+
+    python benchmarks/multivalue_codec.py
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+from splunklib.searchcommands.multivalue import decode_multivalue, encode_multivalue
+
+# The implementation splunklib used before the codec module, see RecordWriter._write_record and
+# SearchCommand._decode_list in the baseline
+_old_encoded_value = re.compile(r'\$(?P<item>(?:\$\$|[^$])*)\$(?:;|$)')
+
+
+def old_decode_multivalue(mv):
+    return [match.replace('$$', '$') for match in _old_encoded_value.findall(mv)]
+
+
+def old_encode_multivalue(values):
+    sv = ''
+    mv = '$'
+    for value in values:
+        if value is None:
+            sv += '\n'
+            mv += '$;$'
+            continue
+        sv += value + '\n'
+        mv += value.replace('$', '$$') + '$;$'
+    return sv[:-1], mv[:-2]
+
+
+CASES = [
+    ('roles, 5 items', ['admin', 'power', 'user', 'can_delete', 'splunk-system-role']),
+    ('hosts, 50 items', ['host{:03}.example.com'.format(index) for index in range(50)]),
+    ('prices with $, 5 items', ['$10', '$20.50', 'USD', '$$', 'n/a']),
+    ('paths, 500 items', ['/opt/splunk/etc/apps/app{}/default'.format(index) for index in range(500)]),
+]
+
+
+def best_of(repeat, number, function, argument):
+    return min(timeit.repeat(lambda: function(argument), repeat=repeat, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--number', type=int, default=2000, help='calls per timeit run')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{:<24} {:<8} {:>10} {:>10} {:>8}'.format('list', 'method', 'old µs', 'codec µs', 'speedup'))
+    for name, values in CASES:
+        mv = encode_multivalue(values)[1]
+        assert decode_multivalue(mv) == old_decode_multivalue(mv) == values
+
+        for method, old, new, argument in (
+                ('encode', old_encode_multivalue, encode_multivalue, values),
+                ('decode', old_decode_multivalue, decode_multivalue, mv)):
+            old_time = best_of(args.repeat, args.number, old, argument)
+            new_time = best_of(args.repeat, args.number, new, argument)
+            print('{:<24} {:<8} {:>10.2f} {:>10.2f} {:>7.1f}x'.format(
+                name, method, old_time, new_time, old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
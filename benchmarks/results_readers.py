@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Compares reading search results as XML with ResultsReader and as JSON with JSONResultsReader.
+
+The same results are rendered the way splunkd returns them for output_mode=xml, json, and json_rows, and read from
+memory. The size of each response, the time to read it, and the rate in results per second are reported.
+
+    python benchmarks/results_readers.py --results 100000
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+from splunklib.results import JSONResultsReader, ResultsReader
+
+
+def make_results(count):
+    return [
+        OrderedDict([
+            ('_time', str(1600000000 + index)), ('host', 'host{}'.format(index % 7)), ('source', '/var/log/app.log'),
+            ('count', str(index)), ('_raw', 'some raw event text {} with <markup> & stuff'.format(index))
+        ])
+        for index in range(count)
+    ]
+
+
+def as_xml(results):
+    fieldnames = list(results[0])
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n<results preview="0">\n<meta><fieldOrder>',
+        ''.join('<field>{}</field>'.format(name) for name in fieldnames),
+        '</fieldOrder></meta>\n'
+    ]
+    for offset, result in enumerate(results):
+        parts.append('<result offset="{}">'.format(offset))
+        for name, value in result.items():
+            parts.append('<field k="{}"><value><text>{}</text></value></field>'.format(name, escape(value)))
+        parts.append('</result>\n')
+    parts.append('</results>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def as_json(results):
+    return json.dumps({
+        'preview': False, 'init_offset': 0, 'messages': [], 'fields': [{'name': name} for name in results[0]],
+        'results': results
+    }).encode('utf-8')
+
+
+def as_json_rows(results):
+    fieldnames = list(results[0])
+    return json.dumps({
+        'preview': False, 'init_offset': 0, 'messages': [], 'fields': fieldnames,
+        'rows': [[result[name] for name in fieldnames] for result in results]
+    }).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--results', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = make_results(args.results)
+
+    print('{:<10} {:<18} {:>10} {:>10} {:>14}'.format('format', 'reader', 'KiB', 'seconds', 'results/s'))
+    for output_mode, render, reader in (
+            ('xml', as_xml, ResultsReader),
+            ('json', as_json, JSONResultsReader),
+            ('json_rows', as_json_rows, JSONResultsReader)):
+        body = render(results)
+        elapsed = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            count = sum(1 for _ in reader(io.BytesIO(body)))
+            elapsed.append(time.perf_counter() - start)
+        assert count == len(results), output_mode
+        print('{:<10} {:<18} {:>10.0f} {:>10.2f} {:>14,.0f}'.format(
+            output_mode, reader.__name__, len(body) / 1024, min(elapsed), len(results) / min(elapsed)))
+
+
+if __name__ == '__main__':
+    main()
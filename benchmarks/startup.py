@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Measures how long a search command takes to answer splunkd's getinfo request.
+
+Splunk starts a new process for every invocation of a command and sends it a getinfo request first. The time from
+starting the process to receiving its response is reported over several runs, followed by the modules that took longest
+to import according to python -X importtime.
+
+    python benchmarks/startup.py --runs 10 bin/checkappcompatibility.py target_version=9.1.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def getinfo_request(command, args, dispatch_dir):
+    metadata = json.dumps({
+        'action': 'getinfo',
+        'preview': False,
+        'searchinfo': {
+            'app': 'search', 'args': args, 'raw_args': args, 'command': command, 'dispatch_dir': dispatch_dir,
+            'earliest_time': '0', 'latest_time': '0', 'owner': 'admin', 'search': '| ' + command, 'session_key': '',
+            'sid': 'startup', 'splunk_version': '9.1.0', 'splunkd_uri': 'https://127.0.0.1:8089'
+        }
+    }).encode('utf-8')
+    return b'chunked 1.0,%d,0\n' % len(metadata) + metadata
+
+
+def time_to_getinfo(script, args, dispatch_dir, python_args=()):
+    request = getinfo_request(os.path.splitext(os.path.basename(script))[0], args, dispatch_dir)
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable] + list(python_args) + [script],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    process.stdin.write(request)
+    process.stdin.flush()
+    header = process.stdout.readline()
+    elapsed = time.perf_counter() - start
+
+    _, stderr = process.communicate()  # closes stdin, which ends the command
+
+    if not header.startswith(b'chunked 1.0,'):
+        raise RuntimeError('{} did not respond to getinfo: {}'.format(script, stderr.decode('utf-8', 'replace')))
+
+    return elapsed, stderr
+
+
+def slowest_imports(stderr, count):
+    imports = []
+    for line in stderr.decode('utf-8', 'replace').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # top level imports only, the cumulative time includes nested ones
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--imports', type=int, default=10, help='number of slowest imports to list')
+    parser.add_argument('script', nargs='?', default=os.path.join(ROOT, 'bin', 'checkappcompatibility.py'))
+    parser.add_argument('args', nargs='*', default=['target_version=9.1.0'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dispatch_dir:
+        time_to_getinfo(args.script, args.args, dispatch_dir)  # warms the file system cache and writes .pyc files
+        timings = [time_to_getinfo(args.script, args.args, dispatch_dir)[0] for _ in range(args.runs)]
+        _, stderr = time_to_getinfo(args.script, args.args, dispatch_dir, ('-X', 'importtime'))
+
+    print('time to getinfo over {} runs: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms'.format(
+        args.runs, 1000 * statistics.median(timings), 1000 * min(timings), 1000 * max(timings)))
+    print()
+    print('{:>12}  {}'.format('cumulative', 'top level import (python -X importtime)'))
+    for cumulative, name in slowest_imports(stderr, args.imports):
+        print('{:>9.1f} ms  {}'.format(cumulative / 1000, name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import socketserver
+
+sys.path.insert(0, os.path.dirname(__file__))
+from checkappcompatibility import CheckAppCompatibilityCommand, CATALOG_SOCKET_PATH
+
+# Keeps the splunkbase catalog and the premium app compatibility matrix in memory and answers compatibility checks over
+# a Unix domain socket, so concurrent searches share one warm catalog instead of downloading their own.
+#
+# Every request is one line of JSON:
+#   {"target_version": "9.1.0", "cloud_compatibility_required": false, "threat_baseapp_as_compatible": false,
+#    "apps": [{"title": ..., "label": ..., "version": ..., "update.homepage": ...}, ...]}
+# Every response is one line of JSON holding the verdict fields of those apps in the same order:
+#   {"results": [{"status": ..., "already_compatible": ..., "is_premium_app": ..., "is_baseapp": ...}, ...]}
+# or {"error": "<message>"} if the request couldn't be answered.
+
+RESULT_FIELDS = ['status', 'already_compatible', 'is_premium_app', 'is_baseapp']
+
+logger = logging.getLogger('catalogdaemon')
+
+
+class Catalog(object):
+    def __init__(self, refresh_interval, load_timeout):
+        self.refresh_interval = refresh_interval
+        self.load_timeout = load_timeout
+        self.splunkbase_apps = {}
+        self.premium_app_compatibility = {}
+        self.loaded = threading.Event()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        checker = CheckAppCompatibilityCommand()
+        splunkbase_apps = checker.get_all_apps()
+        premium_app_compatibility = checker.get_premium_app_compatibility()
+
+        # Requests in flight keep using the snapshot they started with, the new one is swapped in as a whole
+        with self._lock:
+            self.splunkbase_apps = splunkbase_apps
+            self.premium_app_compatibility = premium_app_compatibility
+
+        self.loaded.set()
+        logger.info('Loaded %d splunkbase apps', len(splunkbase_apps))
+
+    def refresh_forever(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the last catalog we have and try again later
+                logger.exception('Failed to refresh the catalog')
+                if not self.loaded.is_set():
+                    time.sleep(60)
+                    continue
+
+            time.sleep(self.refresh_interval)
+
+    def snapshot(self):
+        # Clients fall back to downloading the catalog themselves rather than waiting for us indefinitely
+        if not self.loaded.wait(self.load_timeout):
+            raise RuntimeError(f"Catalog is not loaded yet, waited {self.load_timeout} seconds")
+
+        with self._lock:
+            return self.splunkbase_apps, self.premium_app_compatibility
+
+
+class CatalogRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # A client may send several batches over the same connection
+        for line in self.rfile:
+            try:
+                response = {'results': self.check(json.loads(line))}
+            except Exception as error:
+                logger.exception('Failed to answer request')
+                response = {'error': str(error)}
+
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+    def check(self, request):
+        checker = CheckAppCompatibilityCommand()
+        checker.target_version = request['target_version']
+        checker.cloud_compatibility_required = request.get('cloud_compatibility_required', False)
+        checker.threat_baseapp_as_compatible = request.get('threat_baseapp_as_compatible', False)
+
+        splunkbase_apps, premium_app_compatibility = self.server.catalog.snapshot()
+
+        results = []
+        for installed_app in request['apps']:
+            installed_app = checker.check_version(installed_app, splunkbase_apps, premium_app_compatibility)
+            results.append({field: installed_app[field] for field in RESULT_FIELDS})
+
+        return results
+
+
+class CatalogServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, catalog):
+        self.catalog = catalog
+
+        # A socket left behind by a previous daemon would make bind fail
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        # Binding creates the socket, which must never be accessible to other users
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_path, CatalogRequestHandler)
+        finally:
+            os.umask(umask)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Serves the splunkbase catalog to checkappcompatibility')
+    parser.add_argument('--socket', default=CATALOG_SOCKET_PATH, help='Path of the Unix domain socket to listen on')
+    parser.add_argument('--refresh-interval', type=int, default=3600, help='Seconds between catalog refreshes')
+    parser.add_argument('--load-timeout', type=float, default=10,
+                        help='Seconds a request waits for the first catalog to load before it is answered with an error')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
+
+    catalog = Catalog(args.refresh_interval, args.load_timeout)
+    threading.Thread(target=catalog.refresh_forever, name='catalog-refresh', daemon=True).start()
+
+    os.makedirs(os.path.dirname(args.socket), exist_ok=True)
+    server = CatalogServer(args.socket, catalog)
+    logger.info('Listening on %s', args.socket)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -4,13 +4,14 @@ import os
 import re
 import sys
 import json
-import urllib.request
+import time
 import concurrent.futures
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
 from splunklib.searchcommands import dispatch, ReportingCommand, Configuration, Option, validators
-from bs4 import BeautifulSoup
-from packaging import version
+
+# urllib.request, bs4 and packaging are imported where they are used. Splunk starts this script for the getinfo and
+# map phases too, which never touch the network, and those imports dominate its startup time.
 
 INTERNAL_APPS = [
 	'alert_logevent', 'alert_webhook', 'appsbrowser', 'introspection_generator_addon',
@@ -48,6 +49,26 @@ SPLUNKBASE_URL = 'https://splunkbase.splunk.com/api/v1/app/?limit={}&offset={}'
 
 ES_ITSI_COMPAT_URL = 'https://docs.splunk.com/Documentation/VersionCompatibility/current/Matrix/CompatMatrix'
 
+# Fields of `| rest /services/apps/local` which may contain a link to the app on splunkbase
+SPLUNKBASE_ID_FIELDS = ['update.homepage', 'update.appurl', 'details']
+SPLUNKBASE_ID_REGEX = re.compile(r'splunkbase\.splunk\.com/apps?/(\d+)')
+
+# Where bin/catalogdaemon.py listens by default, see the catalog_socket option
+CATALOG_SOCKET_PATH = os.path.join(
+    os.environ.get('SPLUNK_HOME', '/opt/splunk'), 'var', 'run', 'splunk', 'app_compatibility_catalog.sock')
+# Fields the catalog daemon needs to check an app, the verdict is merged back into the full record
+CATALOG_QUERY_FIELDS = ['title', 'label', 'version'] + SPLUNKBASE_ID_FIELDS
+CATALOG_BATCH_SIZE = 500
+# Seconds to wait for the catalog daemon to accept a connection or answer a batch, it answers with an error after waiting
+# 10 seconds (see --load-timeout) for its first catalog to load
+CATALOG_TIMEOUT = 30
+# Number of apps a worker process checks per task, see the workers option
+CHECK_SHARD_SIZE = 200
+
+
+class CatalogDaemonError(RuntimeError):
+    pass
+
 
 @Configuration(requires_preop=False)
 class CheckAppCompatibilityCommand(ReportingCommand):
@@ -78,35 +99,267 @@ class CheckAppCompatibilityCommand(ReportingCommand):
         require=False
     )
 
+    stamp_results = Option(
+        doc='''
+                **Syntax:** **stamp_results=***<true/false>*
+                **Description:** Adds a generation stamp and the options used to every result so they can be materialized using outputlookup''',
+        validate=validators.Boolean(),
+        default=False,
+        require=False
+    )
+
+    catalog_socket = Option(
+        doc='''
+                **Syntax:** **catalog_socket=***<path>*
+                **Description:** Unix domain socket of a running bin/catalogdaemon.py. If set, apps are checked against the daemon's catalog instead of downloading splunkbase. Falls back to downloading it if the daemon can't be reached, fails or doesn't answer in time''',
+        default=None,
+        require=False
+    )
+
+    workers = Option(
+        doc='''
+                **Syntax:** **workers=***<count>*
+                **Description:** Number of processes used to check apps which can't be identified by their splunkbase ID. Worth it for inventories with tens of thousands of apps''',
+        validate=validators.Integer(minimum=1),
+        default=1,
+        require=False
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.generation = int(time.time())
+        self.pending_apps = []
+        self.catalog_download = None
+
     @Configuration()
     def map(self, records):
         return records
 
     def reduce(self, records):
-        splunkbase_apps = self.get_all_apps()
-        premium_app_compatibility = self.get_premium_app_compatibility()
-        
+        # Splunk sends the input in chunks and calls reduce once per chunk. Internal apps, baseapps and apps without a
+        # version don't need any catalog, so they are sent with the response to their chunk. All other apps are checked
+        # once the input is complete, because only then results can be flushed ahead of the final response.
         for installed_app in records:
-            yield self.check_version(installed_app, splunkbase_apps, premium_app_compatibility)
+            if self.check_locally(installed_app):
+                yield self.finalize_result(installed_app)
+            else:
+                self.pending_apps.append(installed_app)
+
+        if not self.input_finished:
+            # Meanwhile the catalog downloads
+            if self.pending_apps and not self.catalog_socket:
+                self.start_catalog_download()
+            return
+
+        pending_apps, self.pending_apps = self.pending_apps, []
+        self.flush()
+
+        if self.catalog_socket and pending_apps:
+            try:
+                connection = self.connect_catalog_daemon()
+            except OSError as error:
+                self.logger.warning('Catalog daemon at %s is not available, downloading the catalog instead: %s',
+                                    self.catalog_socket, error)
+            else:
+                try:
+                    with connection:
+                        yield from self.reduce_with_catalog_daemon(pending_apps, connection)
+                    return
+                except (OSError, CatalogDaemonError) as error:
+                    # Results sent so far are final, the apps left in pending_apps are checked against our own catalog
+                    self.logger.warning('Catalog daemon at %s failed, downloading the catalog instead: %s',
+                                        self.catalog_socket, error)
+
+        if pending_apps:
+            yield from self.reduce_with_catalog(pending_apps)
+
+    def start_catalog_download(self):
+        if self.catalog_download is None:
+            executor = concurrent.futures.ThreadPoolExecutor()
+            premium_app_compatibility = executor.submit(self.get_premium_app_compatibility)
+            app_pages = self.submit_all_apps(executor)
+            self.catalog_download = executor, premium_app_compatibility, app_pages
+
+        return self.catalog_download
+
+    def reduce_with_catalog(self, pending_apps):
+        executor, premium_app_compatibility, app_pages = self.start_catalog_download()
+
+        try:
+            premium_app_compatibility = premium_app_compatibility.result()
+
+            remaining_apps = []
+            for installed_app in pending_apps:
+                if installed_app['is_premium_app'] == '1':
+                    yield self.finalize_result(
+                        self.check_premium_app_version(installed_app, premium_app_compatibility))
+                else:
+                    remaining_apps.append(installed_app)
+
+            pending_apps = remaining_apps
+            self.flush()
+
+            # Check all apps we can identify by their splunkbase ID as soon as the page containing them arrives
+            splunkbase_apps = {}
+            for app_page in concurrent.futures.as_completed(app_pages):
+                page_apps = {app['uid']: app for app in app_page.result()}
+                splunkbase_apps.update(page_apps)
+
+                remaining_apps = []
+                for installed_app in pending_apps:
+                    splunkbase_app = self.find_identified_app(installed_app, page_apps)
+
+                    if splunkbase_app:
+                        yield self.finalize_result(self.check_catalog_version(
+                            installed_app, {splunkbase_app['uid']: splunkbase_app}, premium_app_compatibility))
+                    else:
+                        remaining_apps.append(installed_app)
+
+                pending_apps = remaining_apps
+                self.flush()
+        finally:
+            # All pages have arrived, so the thread pool is gone before we possibly fork worker processes
+            executor.shutdown()
+            self.catalog_download = None
+
+        # Apps matched by appid or label need the complete catalog to rule out multiple matches
+        if self.workers > 1 and len(pending_apps) > CHECK_SHARD_SIZE:
+            checked_apps = self.check_versions_in_parallel(pending_apps, splunkbase_apps, premium_app_compatibility)
+        else:
+            checked_apps = (
+                self.check_catalog_version(installed_app, splunkbase_apps, premium_app_compatibility)
+                for installed_app in pending_apps
+            )
+
+        for installed_app in checked_apps:
+            yield self.finalize_result(installed_app)
+
+    def reduce_with_catalog_daemon(self, pending_apps, connection):
+        """Checks pending_apps batch by batch, removing every batch from it once its results are sent."""
+        with connection.makefile('rwb') as stream:
+            while pending_apps:
+                batch = pending_apps[:CATALOG_BATCH_SIZE]
+                results = self.query_catalog_daemon(stream, batch)
+
+                for installed_app, result in zip(batch, results):
+                    installed_app.update(result)
+                    yield self.finalize_result(installed_app)
+
+                del pending_apps[:len(batch)]
+                self.flush()
+
+    def connect_catalog_daemon(self):
+        import socket
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # A timeout raises socket.timeout, an OSError, so we fall back to downloading the catalog
+        connection.settimeout(CATALOG_TIMEOUT)
+        try:
+            connection.connect(self.catalog_socket)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+
+    def query_catalog_daemon(self, stream, installed_apps):
+        request = {
+            'target_version': self.target_version,
+            'cloud_compatibility_required': bool(self.cloud_compatibility_required),
+            'threat_baseapp_as_compatible': bool(self.threat_baseapp_as_compatible),
+            'apps': [
+                {field: installed_app[field] for field in CATALOG_QUERY_FIELDS if field in installed_app}
+                for installed_app in installed_apps
+            ]
+        }
+        stream.write(json.dumps(request).encode('utf-8') + b'\n')
+        stream.flush()
+
+        line = stream.readline()
+        if not line:
+            raise CatalogDaemonError("Connection closed by the daemon")
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise CatalogDaemonError(response['error'])
+
+        results = response.get('results')
+        if not isinstance(results, list) or len(results) != len(installed_apps):
+            raise CatalogDaemonError("Expected {} results, not {}".format(
+                len(installed_apps), len(results) if isinstance(results, list) else results))
+
+        return results
+
+    def check_versions_in_parallel(self, installed_apps, splunkbase_apps, premium_app_compatibility):
+        import multiprocessing
+
+        catalog = (splunkbase_apps, premium_app_compatibility)
+        options = {
+            'target_version': self.target_version,
+            'cloud_compatibility_required': self.cloud_compatibility_required,
+            'threat_baseapp_as_compatible': self.threat_baseapp_as_compatible
+        }
+
+        # Forked workers inherit the catalog, otherwise it is pickled once per worker rather than once per task
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            _worker_state['catalog'] = catalog
+            initargs = (options,)
+        else:
+            context = multiprocessing.get_context()
+            initargs = (options, catalog)
+
+        shards = [
+            installed_apps[offset:offset + CHECK_SHARD_SIZE]
+            for offset in range(0, len(installed_apps), CHECK_SHARD_SIZE)
+        ]
+
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                    self.workers, mp_context=context, initializer=_init_worker, initargs=initargs) as executor:
+                # map returns the shards in order, so the output doesn't depend on which worker finishes first
+                for checked_apps in executor.map(_check_shard, shards):
+                    yield from checked_apps
+        finally:
+            _worker_state.clear()
+
+    def finalize_result(self, installed_app):
+        if self.stamp_results:
+            self.stamp_result(installed_app, self.generation)
+
+        return installed_app
+
+    def stamp_result(self, installed_app, generation):
+        # Those fields identify a materialized result, see lookups/app_compatibility_results.csv
+        installed_app['generation'] = generation
+        installed_app['checked_target_version'] = self.target_version
+        installed_app['checked_cloud_compatibility'] = 'true' if self.cloud_compatibility_required else 'false'
+        installed_app['checked_baseapp_as_compatible'] = 'true' if self.threat_baseapp_as_compatible else 'false'
+        return installed_app
 
     def get_apps(self, limit=100, offset=0):
+        import urllib.request
         url = SPLUNKBASE_URL.format(limit, offset)
         data = json.load(urllib.request.urlopen(url))
         return data['results']
 
 
-    def get_all_apps(self):
+    def submit_all_apps(self, executor):
         limit = 100
         offset = 0
         total_apps = 10000
 
         futures = []
+        while (offset + limit < total_apps):
+            futures.append(
+                executor.submit(self.get_apps, offset=offset, limit=limit)
+            )
+            offset = offset + limit
+
+        return futures
+
+
+    def get_all_apps(self):
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            while (offset + limit < total_apps):
-                futures.append(
-                    executor.submit(self.get_apps, offset=offset, limit=limit)
-                )
-                offset = offset + limit
+            futures = self.submit_all_apps(executor)
 
         apps = {}
         for future in concurrent.futures.as_completed(futures):
@@ -117,6 +370,8 @@ class CheckAppCompatibilityCommand(ReportingCommand):
 
 
     def get_premium_app_compatibility(self):
+        import urllib.request
+        from bs4 import BeautifulSoup
         req = urllib.request.urlopen(ES_ITSI_COMPAT_URL)
         bs = BeautifulSoup(req, 'html.parser')
 
@@ -175,7 +430,8 @@ class CheckAppCompatibilityCommand(ReportingCommand):
             if installed_app['title'] in ITSI_APPS:
                 valid_versions = premium_app_compatibility[self.target_version]['ITSI']
 
-            valid_versions.sort(reverse=True)
+            # Sort a copy, the matrix may be shared with concurrent checks (see bin/catalogdaemon.py)
+            valid_versions = sorted(valid_versions, reverse=True)
             for valid_version in valid_versions:
                 # In some cases the version in the compatibility matrix is abbriviated with .x
                 # So we compare the part we actually have
@@ -197,7 +453,20 @@ class CheckAppCompatibilityCommand(ReportingCommand):
         return installed_app
 
 
-    def check_version(self, installed_app, splunkbase_apps, premium_app_compatibility):
+    def get_splunkbase_id(self, installed_app):
+        for field in SPLUNKBASE_ID_FIELDS:
+            if field not in installed_app or not installed_app[field]:
+                continue
+
+            match = SPLUNKBASE_ID_REGEX.search(installed_app[field])
+            if match:
+                return int(match.group(1))
+
+        return None
+
+
+    def check_locally(self, installed_app):
+        """Decides on apps which don't need any catalog. Returns False if the app needs to be checked further."""
         installed_app['status'] = ''
         installed_app['already_compatible'] = 'no'
         installed_app['is_premium_app'] = '0'
@@ -208,7 +477,7 @@ class CheckAppCompatibilityCommand(ReportingCommand):
         if installed_app['title'] in INTERNAL_APPS:
             installed_app['status'] = f"✅ App is an internal app so it will be updated during splunk upgrade."
             installed_app['already_compatible'] = 'yes'
-            return installed_app
+            return True
 
         is_baseapp = bool([base_app for base_app in BASE_APPS if installed_app['title'].endswith(base_app)])
         if is_baseapp:
@@ -216,28 +485,54 @@ class CheckAppCompatibilityCommand(ReportingCommand):
             if self.threat_baseapp_as_compatible:
                 installed_app['status'] = f"✅ This is a baseapp."
                 installed_app['already_compatible'] = 'yes'
-                return installed_app
+                return True
 
             installed_app['status'] = f"🛑 This is a baseapp."
             installed_app['already_compatible'] = 'no'
-            return installed_app
+            return True
 
         if 'version' not in installed_app or not installed_app['version']:
             installed_app['already_compatible'] = 'undecided'
             installed_app['status'] = '🛑 No version information available. Therefore were\'re not able to check for updates.'
-            return installed_app
+            return True
 
         if installed_app['title'] in ENTERPRISE_SECURITY_APPS or installed_app['title'] in ITSI_APPS:
             installed_app['is_premium_app'] = '1'
+
+        return False
+
+
+    def find_identified_app(self, installed_app, splunkbase_apps):
+        """Returns the splunkbase app if it is identified by its ID. Matching its appid or label needs the complete
+        catalog, otherwise we couldn't tell whether there are multiple matches."""
+        splunkbase_id = self.get_splunkbase_id(installed_app)
+        return splunkbase_apps.get(splunkbase_id)
+
+
+    def check_version(self, installed_app, splunkbase_apps, premium_app_compatibility):
+        if self.check_locally(installed_app):
+            return installed_app
+
+        return self.check_catalog_version(installed_app, splunkbase_apps, premium_app_compatibility)
+
+
+    def check_catalog_version(self, installed_app, splunkbase_apps, premium_app_compatibility):
+        """Checks an app check_locally couldn't decide on against the catalog."""
+        from packaging import version
+        if installed_app['is_premium_app'] == '1':
             return self.check_premium_app_version(installed_app, premium_app_compatibility)
 
         # On splunkbase all compatible versions are displayed as 9.0 not 9.0.1
         if self.target_version.count('.') > 1:
             target_version = '.'.join(self.target_version.split('.')[0:2])
 
-        # Find splunkbase app
+        # Find splunkbase app, the ID taken from update.homepage is unambiguous so we try that first
         splunkbase_app = None
-        if 'title' in installed_app and installed_app['title']:
+        splunkbase_id = self.get_splunkbase_id(installed_app)
+        if splunkbase_id in splunkbase_apps:
+            splunkbase_app = [splunkbase_apps[splunkbase_id]]
+
+        if not splunkbase_app and 'title' in installed_app and installed_app['title']:
             splunkbase_app = [app for app in splunkbase_apps.values() if app['appid'] == installed_app['title']]
 
         if not splunkbase_app and 'label' in installed_app and installed_app['label']:
@@ -326,5 +621,28 @@ class CheckAppCompatibilityCommand(ReportingCommand):
         return installed_app
 
 
+# State of a worker process started by check_versions_in_parallel
+_worker_state = {}
+
+
+def _init_worker(options, catalog=None):
+    if catalog is not None:
+        _worker_state['catalog'] = catalog
+
+    checker = CheckAppCompatibilityCommand()
+    for name, value in options.items():
+        setattr(checker, name, value)
+
+    _worker_state['checker'] = checker
+
+
+def _check_shard(installed_apps):
+    checker = _worker_state['checker']
+    splunkbase_apps, premium_app_compatibility = _worker_state['catalog']
+    return [
+        checker.check_catalog_version(installed_app, splunkbase_apps, premium_app_compatibility)
+        for installed_app in installed_apps
+    ]
+
 
 dispatch(CheckAppCompatibilityCommand, sys.argv, sys.stdin, sys.stdout, __name__)
@@ -4,7 +4,6 @@ import os
 import re
 import sys
 import time
-import urllib.request
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
 from splunklib.searchcommands import dispatch, GeneratingCommand, Configuration, Option, validators
@@ -17,6 +16,7 @@ class GetSplunkVersionsCommand(GeneratingCommand):
 
     # I know it's quite a hack. If somebody knows a better way build a PR
     def generate(self):
+        import urllib.request
         try:
             cnt = str(urllib.request.urlopen(uri).read())
         except Exception as e:
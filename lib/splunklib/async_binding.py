@@ -0,0 +1,593 @@
+# Copyright 2011-2015 Splunk, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"): you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The **splunklib.async_binding** module provides an :mod:`asyncio` version of
+the :mod:`splunklib.binding` interface.
+
+:class:`AsyncContext` mirrors :class:`splunklib.binding.Context`: its
+:meth:`AsyncContext.get`, :meth:`AsyncContext.post`,
+:meth:`AsyncContext.delete`, :meth:`AsyncContext.request`, and
+:meth:`AsyncContext.login` methods take the same arguments, but are
+coroutines. Requests are sent over :mod:`asyncio` streams, so a single thread
+can keep hundreds of requests in flight. Connections are kept alive and reused,
+like they are by :func:`splunklib.binding.handler`.
+
+Response bodies are :class:`AsyncResponseReader` objects, which are read with
+``await body.read()`` or iterated over with ``async for``.
+
+This module requires Python 3.5 or later.
+
+**Example**::
+
+    import asyncio
+    from splunklib import async_binding
+
+    async def main():
+        c = await async_binding.connect(host="localhost", username="admin", password="changeme")
+        responses = await asyncio.gather(*[c.get("apps/local/" + name) for name in names])
+        for response in responses:
+            print(await response.body.read())
+
+    asyncio.run(main())
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import logging
+import ssl
+import time
+from functools import wraps
+from io import BytesIO
+from xml.etree.ElementTree import XML
+
+from .binding import (_RETRYABLE_METHODS, AuthenticationError, Context, HTTPError, HttpLib, _handle_auth_error,
+                      _NoAuthenticationToken, _spliturl)
+from .data import record
+
+__all__ = [
+    "AsyncContext",
+    "AsyncHttpLib",
+    "AsyncResponseReader",
+    "connect"
+]
+
+
+def _async_authentication(request_fun):
+    """Coroutine version of :func:`splunklib.binding._authentication`."""
+    @wraps(request_fun)
+    async def wrapper(self, *args, **kwargs):
+        if self.token is _NoAuthenticationToken and \
+                not self.has_cookies():
+            # Not yet logged in.
+            if self.autologin and self.username and self.password:
+                # This will throw an uncaught
+                # AuthenticationError if it fails.
+                await self.login()
+            else:
+                # Try the request anyway without authentication.
+                # Most requests will fail. Some will succeed, such as
+                # 'GET server/info'.
+                with _handle_auth_error("Request aborted: not logged in."):
+                    return await request_fun(self, *args, **kwargs)
+        try:
+            # Issue the request
+            return await request_fun(self, *args, **kwargs)
+        except HTTPError as he:
+            if he.status == 401 and self.autologin:
+                # Authentication failed. Try logging in, and then
+                # rerunning the request. If either step fails, throw
+                # an AuthenticationError and give up.
+                with _handle_auth_error("Autologin failed."):
+                    await self.login()
+                with _handle_auth_error(
+                        "Autologin succeeded, but there was an auth error on "
+                        "next request. Something is very wrong."):
+                    return await request_fun(self, *args, **kwargs)
+            elif he.status == 401 and not self.autologin:
+                raise AuthenticationError(
+                    "Request failed: Session is not logged in.", he)
+            else:
+                raise
+
+    return wrapper
+
+
+class AsyncContext(Context):
+    """An :mod:`asyncio` version of :class:`splunklib.binding.Context`.
+
+    It takes the same arguments as :class:`splunklib.binding.Context`, except
+    for ``handler``, and the following additional ones.
+
+    :param timeout: The request time-out period, in seconds (optional).
+    :type timeout: ``integer`` or "None"
+    :param max_connections: The number of idle connections kept per host (the
+        default is 8).
+    :type max_connections: ``integer``
+    :param idle_timeout: The number of seconds after which an idle connection
+        is no longer reused (the default is 10, below splunkd's 12).
+    :type idle_timeout: ``integer``
+    """
+    def __init__(self, **kwargs):
+        Context.__init__(self, **kwargs)
+        cookies = self.http._cookies
+        self.http = AsyncHttpLib(
+            verify=kwargs.get("verify", False), key_file=kwargs.get("key_file"), cert_file=kwargs.get("cert_file"),
+            timeout=kwargs.get("timeout"), max_connections=kwargs.get("max_connections", 8),
+            idle_timeout=kwargs.get("idle_timeout", 10))
+        self.http._cookies = cookies
+        self._login = None
+
+    @_async_authentication
+    async def delete(self, path_segment, owner=None, app=None, sharing=None, **query):
+        """Performs a DELETE operation, see :meth:`splunklib.binding.Context.delete`."""
+        path = self.authority + self._abspath(path_segment, owner=owner,
+                                              app=app, sharing=sharing)
+        logging.debug("DELETE request to %s (body: %s)", path, repr(query))
+        return await self.http.delete(path, self._auth_headers, **query)
+
+    @_async_authentication
+    async def get(self, path_segment, owner=None, app=None, headers=None, sharing=None, **query):
+        """Performs a GET operation, see :meth:`splunklib.binding.Context.get`."""
+        if headers is None:
+            headers = []
+
+        path = self.authority + self._abspath(path_segment, owner=owner,
+                                              app=app, sharing=sharing)
+        logging.debug("GET request to %s (body: %s)", path, repr(query))
+        all_headers = headers + self.additional_headers + self._auth_headers
+        return await self.http.get(path, all_headers, **query)
+
+    @_async_authentication
+    async def post(self, path_segment, owner=None, app=None, sharing=None, headers=None, **query):
+        """Performs a POST operation, see :meth:`splunklib.binding.Context.post`."""
+        if headers is None:
+            headers = []
+
+        path = self.authority + self._abspath(path_segment, owner=owner, app=app, sharing=sharing)
+        logging.debug("POST request to %s (body: %s)", path, repr(query))
+        all_headers = headers + self.additional_headers + self._auth_headers
+        return await self.http.post(path, all_headers, **query)
+
+    @_async_authentication
+    async def request(self, path_segment, method="GET", headers=None, body="",
+                      owner=None, app=None, sharing=None):
+        """Issues an arbitrary HTTP request, see :meth:`splunklib.binding.Context.request`."""
+        if headers is None:
+            headers = []
+
+        path = self.authority \
+            + self._abspath(path_segment, owner=owner,
+                            app=app, sharing=sharing)
+        all_headers = headers + self.additional_headers + self._auth_headers
+        logging.debug("%s request to %s (headers: %s, body: %s)",
+                      method, path, str(all_headers), repr(body))
+        return await self.http.request(path,
+                                       {'method': method,
+                                        'headers': all_headers,
+                                        'body': body})
+
+    async def gather(self, requests, max_workers=64):
+        """Issues several requests concurrently and returns their responses in order.
+
+        See :meth:`splunklib.binding.Context.gather` for the format of
+        *requests*. At most *max_workers* requests are in flight at a time.
+        """
+        requests = list(requests)
+
+        if len(requests) == 0:
+            return []
+
+        # Log in once up front rather than once per request
+        if self.token is _NoAuthenticationToken and not self.has_cookies() and \
+                self.autologin and self.username and self.password:
+            await self.login()
+
+        methods = {'GET': self.get, 'POST': self.post, 'DELETE': self.delete}
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def issue(request):
+            async with semaphore:
+                kwargs = dict(request)
+                method = kwargs.pop('method', 'GET').upper()
+                return await methods[method](kwargs.pop('path_segment'), **kwargs)
+
+        return await asyncio.gather(*[issue(request) for request in requests], return_exceptions=True)
+
+    async def wait_for_job(self, sid, timeout=None, on_progress=None, min_interval=0.05, max_interval=2,
+                           owner=None, app=None, sharing=None):
+        """Waits for the search job *sid* to finish, see :meth:`splunklib.client.Job.wait`.
+
+        Waiting on many jobs at once takes a single thread, as in
+        ``await asyncio.gather(*[c.wait_for_job(sid) for sid in sids])``.
+
+        :return: The last status of the job, as passed to *on_progress*.
+        """
+        from .client import PATH_JOBS, OperationError, _JOB_STATUS_FIELDS, _load_job_status
+
+        deadline = None if timeout is None else time.time() + timeout
+        interval = min_interval
+
+        while True:
+            response = await self.get(PATH_JOBS + sid, owner=owner, app=app, sharing=sharing,
+                                      output_mode='json', f=_JOB_STATUS_FIELDS)
+            status = _load_job_status(await response.body.read())
+            if status is not None:
+                if on_progress is not None:
+                    on_progress(status)
+                if status.isDone:
+                    return status
+            if deadline is None:
+                await asyncio.sleep(interval)
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise OperationError("Job %s did not finish within %s seconds." % (sid, timeout))
+                await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+
+    async def login(self):
+        """Logs into the Splunk instance, see :meth:`splunklib.binding.Context.login`.
+
+        Concurrent calls share a single login request.
+        """
+        if self._login is None:
+            self._login = asyncio.ensure_future(self._login_once())
+        login = self._login
+        try:
+            return await login
+        finally:
+            if self._login is login:
+                self._login = None
+
+    async def _login_once(self):
+        if not self._login_required():
+            return
+        # Only try to get a token and updated cookie if username & password are specified
+        try:
+            response = await self.http.post(
+                self.authority + self._abspath("/services/auth/login"),
+                username=self.username,
+                password=self.password,
+                headers=self.additional_headers,
+                cookie="1") # In Splunk 6.2+, passing "cookie=1" will return the "set-cookie" header
+
+            body = await response.body.read()
+            session = XML(body).findtext("./sessionKey")
+            self.token = "Splunk %s" % session
+            return self
+        except HTTPError as he:
+            if he.status == 401:
+                raise AuthenticationError("Login failed.", he)
+            else:
+                raise
+
+    def close(self):
+        """Closes all idle connections."""
+        self.http.close()
+
+
+async def connect(**kwargs):
+    """Returns an authenticated :class:`AsyncContext` object.
+
+    This coroutine is a shorthand for calling :meth:`AsyncContext.login`, see
+    :func:`splunklib.binding.connect` for its arguments.
+    """
+    c = AsyncContext(**kwargs)
+    await c.login()
+    return c
+
+
+class AsyncHttpLib(HttpLib):
+    """An :mod:`asyncio` version of :class:`splunklib.binding.HttpLib`.
+
+    Its :meth:`delete`, :meth:`get`, :meth:`post`, and :meth:`request`
+    methods return awaitables. Response bodies are
+    :class:`AsyncResponseReader` objects.
+
+    Connections are pooled and retried like those of
+    :func:`splunklib.binding.handler`: a request is sent again on a new
+    connection if writing it to a reused connection failed. GET, HEAD,
+    and OPTIONS requests are also sent again if the server closed the
+    reused connection without responding.
+    """
+    def __init__(self, verify=False, key_file=None, cert_file=None, timeout=None, max_connections=8, idle_timeout=10):
+        if verify:
+            self._ssl_context = ssl.create_default_context()
+        else:
+            self._ssl_context = ssl._create_unverified_context()
+        if cert_file is not None:
+            self._ssl_context.load_cert_chain(cert_file, key_file)
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._idle_timeout = idle_timeout
+        self._idle = {}
+        self._cookies = {}
+
+    # HttpLib.delete, get, and post build the message and return self.request(url, message), which is a coroutine
+    # here, so they need no overrides.
+
+    async def request(self, url, message, **kwargs):
+        """Issues an HTTP request to a URL, see :meth:`splunklib.binding.HttpLib.request`."""
+        response = record(await self._send(url, message))
+        if 400 <= response.status:
+            # HTTPError reads the body synchronously
+            response.body = BytesIO(await response.body.read())
+            raise HTTPError(response)
+
+        self._update_cookies(response)
+        return response
+
+    def close(self):
+        """Closes all idle connections."""
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection, _ in connections:
+                connection.close()
+
+    async def _send(self, url, message):
+        scheme, host, port, path = _spliturl(url)
+        body = message.get("body", "")
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        head = {
+            "Content-Length": str(len(body)),
+            "Host": host,
+            "User-Agent": "splunk-sdk-python/1.6.16",
+            "Accept": "*/*",
+            "Connection": "Keep-Alive",
+        } # defaults
+        for key, value in message["headers"]:
+            head[key] = value
+        method = message.get("method", "GET")
+
+        request = ["%s %s HTTP/1.1\r\n" % (method, path)]
+        request.extend("%s: %s\r\n" % (key, value) for key, value in head.items())
+        request.append("\r\n")
+        request = "".join(request).encode('latin-1') + body
+
+        key = scheme, host, int(port)
+        connection, reused = await self._acquire(key)
+
+        try:
+            response = await self._exchange(key, connection, method, request, reused)
+            if response is None:
+                # The server closed the idle connection as we reused it
+                connection.close()
+                connection = await self._connect(key)
+                response = await self._exchange(key, connection, method, request, False)
+            return response
+        except BaseException:
+            connection.close()
+            raise
+
+    async def _exchange(self, key, connection, method, request, reused):
+        # Returns None instead, if the connection is reused and the request may be sent again. That is, writing the
+        # request failed or, for GET, HEAD, and OPTIONS, the server closed the connection without sending any part of
+        # a response.
+        try:
+            connection.writer.write(request)
+            await connection.writer.drain()
+        except ConnectionError:
+            if reused:
+                return None
+            raise
+
+        interim = False
+        while True:
+            status_line = await self._wait(connection.reader.readline())
+            if not status_line:
+                if reused and not interim and method in _RETRYABLE_METHODS:
+                    return None
+                raise ConnectionResetError("Connection closed by the server")
+            version, status, reason = (status_line.decode('latin-1').rstrip("\r\n").split(" ", 2) + [""])[:3]
+            status = int(status)
+
+            headers = []
+            while True:
+                line = await self._wait(connection.reader.readline())
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode('latin-1').partition(":")
+                headers.append((name.strip(), value.strip()))
+
+            # Interim (1xx) responses, like 100 Continue, precede the final one and carry no body
+            if not 100 <= status < 200:
+                break
+            interim = True
+
+        fields = dict((name.lower(), value.lower()) for name, value in headers)
+        will_close = fields.get("connection") == "close" or \
+            (version == "HTTP/1.0" and fields.get("connection") != "keep-alive")
+
+        if method == "HEAD" or status in (204, 304):
+            length, chunked = 0, False
+        elif fields.get("transfer-encoding", "").endswith("chunked"):
+            length, chunked = None, True
+        elif "content-length" in fields:
+            length, chunked = int(fields["content-length"]), False
+        else:
+            # The body ends when the server closes the connection
+            length, chunked, will_close = None, False, True
+
+        release = None if will_close else lambda: self._release(key, connection)
+        body = AsyncResponseReader(connection, length, chunked, release, self._timeout)
+
+        return {
+            "status": status,
+            "reason": reason,
+            "headers": headers,
+            "body": body,
+        }
+
+    async def _acquire(self, key):
+        now = time.time()
+        idle = self._idle.get(key)
+        while idle:
+            connection, released = idle.pop()
+            if now - released < self._idle_timeout and not connection.reader.at_eof():
+                return connection, True
+            connection.close()
+        return await self._connect(key), False
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        if scheme == "http":
+            context = None
+        elif scheme == "https":
+            context = self._ssl_context
+        else:
+            raise ValueError("unsupported scheme: %s" % scheme)
+        reader, writer = await self._wait(asyncio.open_connection(host, port, ssl=context))
+        return _AsyncConnection(reader, writer)
+
+    def _release(self, key, connection):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self._max_connections:
+            idle.append((connection, time.time()))
+        else:
+            connection.close()
+
+    def _wait(self, awaitable):
+        return awaitable if self._timeout is None else asyncio.wait_for(awaitable, self._timeout)
+
+
+class _AsyncConnection(object):
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncResponseReader(object):
+    """An :mod:`asyncio` version of :class:`splunklib.binding.ResponseReader`.
+
+    Read the body with ``await reader.read()`` or iterate over its chunks with
+    ``async for``. The connection serves the next request once the body has
+    been read to the end. Close a reader you don't read to the end.
+    """
+    def __init__(self, connection, length, chunked, release=None, timeout=None):
+        self._connection = connection
+        self._remaining = length
+        self._chunked = chunked
+        self._chunk_remaining = 0
+        self._release = release
+        self._timeout = timeout
+        self._buffer = b''
+        self._done = False
+        if length == 0:
+            self._finish()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self.read(65536)
+        if not data:
+            raise StopAsyncIteration
+        return data
+
+    async def peek(self, size):
+        """Nondestructively retrieves a given number of bytes.
+
+        The next :meth:`read` operation behaves as though this method was never
+        called.
+        """
+        c = await self.read(size)
+        self._buffer = self._buffer + c
+        return c
+
+    async def read(self, size=None):
+        """Reads a given number of bytes from the response, or the entire response if *size* is ``None``.
+
+        Fewer bytes than requested are returned only at the end of the response.
+        """
+        r = self._buffer
+        self._buffer = b''
+
+        if size is None:
+            chunks = [r]
+            while True:
+                data = await self._read_some(65536)
+                if not data:
+                    break
+                chunks.append(data)
+            return b''.join(chunks)
+
+        chunks = [r]
+        size -= len(r)
+        while size > 0:
+            data = await self._read_some(size)
+            if not data:
+                break
+            chunks.append(data)
+            size -= len(data)
+        return b''.join(chunks)
+
+    def close(self):
+        """Closes this response; the connection is closed, unless the response was read to the end."""
+        if not self._done:
+            self._done = True
+            self._connection.close()
+
+    async def _read_some(self, size):
+        if self._done:
+            return b''
+
+        reader = self._connection.reader
+
+        if self._chunked:
+            if self._chunk_remaining == 0:
+                line = await self._wait(reader.readline())
+                chunk_size = int(line.split(b";", 1)[0].strip(), 16)
+                if chunk_size == 0:
+                    # Skip trailers
+                    while (await self._wait(reader.readline())) not in (b"\r\n", b"\n", b""):
+                        pass
+                    self._finish()
+                    return b''
+                self._chunk_remaining = chunk_size
+            data = await self._wait(reader.read(min(size, self._chunk_remaining)))
+            if not data:
+                raise asyncio.IncompleteReadError(b'', self._chunk_remaining)
+            self._chunk_remaining -= len(data)
+            if self._chunk_remaining == 0:
+                await self._wait(reader.readexactly(2))  # CRLF ending the chunk
+            return data
+
+        if self._remaining is None:
+            data = await self._wait(reader.read(size))
+            if not data:
+                self._finish()
+            return data
+
+        data = await self._wait(reader.read(min(size, self._remaining)))
+        if not data:
+            raise asyncio.IncompleteReadError(b'', self._remaining)
+        self._remaining -= len(data)
+        if self._remaining == 0:
+            self._finish()
+        return data
+
+    def _finish(self):
+        self._done = True
+        if self._release is None:
+            self._connection.close()
+        else:
+            self._release()
+
+    def _wait(self, awaitable):
+        return awaitable if self._timeout is None else asyncio.wait_for(awaitable, self._timeout)
@@ -28,9 +28,12 @@ from __future__ import absolute_import
 
 import io
 import logging
+import select
 import socket
 import ssl
 import sys
+import threading
+import time
 from base64 import b64encode
 from contextlib import contextmanager
 from datetime import datetime
@@ -835,6 +838,73 @@ class Context(object):
                                      'body': body})
         return response
 
+    def gather(self, requests, max_workers=8):
+        """Issues several requests concurrently and returns their responses in order.
+
+        Each request is a ``dict`` with the keys ``method`` (``GET``, ``POST``,
+        or ``DELETE``; the default is ``GET``) and ``path_segment``. All other
+        keys are passed as keyword arguments to :meth:`get`, :meth:`post`, or
+        :meth:`delete`, which handle authentication and autologin as usual.
+
+        A request that fails doesn't affect the others: its exception is
+        returned in place of its response.
+
+        :param requests: The requests to issue.
+        :type requests: ``list`` of ``dict``
+        :param max_workers: The maximum number of requests in flight (the
+            default is 8).
+        :type max_workers: ``integer``
+        :return: The responses, or the exceptions raised instead, in the order
+            of *requests*.
+        :rtype: ``list``
+
+        **Example**::
+
+            c = binding.connect(...)
+            responses = c.gather([
+                {'path_segment': 'apps/local', 'count': 0},
+                {'path_segment': 'properties/app', 'app': 'search'},
+                {'method': 'POST', 'path_segment': 'saved/searches', 'name': 'foo', 'search': '*'}])
+        """
+        requests = list(requests)
+        responses = [None] * len(requests)
+
+        if len(requests) == 0:
+            return responses
+
+        # Log in once up front rather than once per worker
+        if self.token is _NoAuthenticationToken and not self.has_cookies() and \
+                self.autologin and self.username and self.password:
+            self.login()
+
+        methods = {'GET': self.get, 'POST': self.post, 'DELETE': self.delete}
+        pending = six.moves.queue.Queue()
+
+        for index, request in enumerate(requests):
+            pending.put((index, request))
+
+        def work():
+            while True:
+                try:
+                    index, request = pending.get_nowait()
+                except six.moves.queue.Empty:
+                    return
+                try:
+                    kwargs = dict(request)
+                    method = kwargs.pop('method', 'GET').upper()
+                    responses[index] = methods[method](kwargs.pop('path_segment'), **kwargs)
+                except Exception as e:
+                    responses[index] = e
+
+        workers = [threading.Thread(target=work) for _ in range(min(max_workers, len(requests)))]
+
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return responses
+
     def login(self):
         """Logs into the Splunk instance referred to by the :class:`Context`
         object.
@@ -855,47 +925,53 @@ class Context(object):
             # Then issue requests...
         """
 
+        if not self._login_required():
+            return
+        # Only try to get a token and updated cookie if username & password are specified
+        try:
+            response = self.http.post(
+                self.authority + self._abspath("/services/auth/login"),
+                username=self.username,
+                password=self.password,
+                headers=self.additional_headers,
+                cookie="1") # In Splunk 6.2+, passing "cookie=1" will return the "set-cookie" header
+
+            body = response.body.read()
+            session = XML(body).findtext("./sessionKey")
+            self.token = "Splunk %s" % session
+            return self
+        except HTTPError as he:
+            if he.status == 401:
+                raise AuthenticationError("Login failed.", he)
+            else:
+                raise
+
+    def _login_required(self):
         if self.has_cookies() and \
                 (not self.username and not self.password):
             # If we were passed session cookie(s), but no username or
             # password, then login is a nop, since we're automatically
             # logged in.
-            return
+            return False
 
         if self.token is not _NoAuthenticationToken and \
                 (not self.username and not self.password):
             # If we were passed a session token, but no username or
             # password, then login is a nop, since we're automatically
             # logged in.
-            return
+            return False
 
         if self.basic and (self.username and self.password):
             # Basic auth mode requested, so this method is a nop as long
             # as credentials were passed in.
-            return
+            return False
 
         if self.bearerToken:
             # Bearer auth mode requested, so this method is a nop as long
             # as authentication token was passed in.
-            return
-        # Only try to get a token and updated cookie if username & password are specified
-        try:
-            response = self.http.post(
-                self.authority + self._abspath("/services/auth/login"),
-                username=self.username,
-                password=self.password,
-                headers=self.additional_headers,
-                cookie="1") # In Splunk 6.2+, passing "cookie=1" will return the "set-cookie" header
+            return False
 
-            body = response.body.read()
-            session = XML(body).findtext("./sessionKey")
-            self.token = "Splunk %s" % session
-            return self
-        except HTTPError as he:
-            if he.status == 401:
-                raise AuthenticationError("Login failed.", he)
-            else:
-                raise
+        return True
 
     def logout(self):
         """Forgets the current session token, and cookies."""
@@ -1261,6 +1337,10 @@ class HttpLib(object):
         if 400 <= response.status:
             raise HTTPError(response)
 
+        self._update_cookies(response)
+        return response
+
+    def _update_cookies(self, response):
         # Update the cookie with any HTTP request
         # Initially, assume list of 2-tuples
         key_value_tuples = response.headers
@@ -1272,8 +1352,6 @@ class HttpLib(object):
             if key.lower() == "set-cookie":
                 _parse_cookies(value, self._cookies)
 
-        return response
-
 
 # Converts an httplib response into a file-like object.
 class ResponseReader(io.RawIOBase):
@@ -1286,10 +1364,16 @@ class ResponseReader(io.RawIOBase):
     # For testing, you can use a StringIO as the argument to
     # ``ResponseReader`` instead of an ``httplib.HTTPResponse``. It
     # will work equally well.
-    def __init__(self, response, connection=None):
+
+    _block_size = 8192  # number of characters peek reads at once
+
+    def __init__(self, response, connection=None, release=None):
         self._response = response
         self._connection = connection
-        self._buffer = b''
+        self._release = release
+        # Bytes that have been peeked at but not read yet. They are consumed from the front, which a bytearray does
+        # without moving the rest of its contents.
+        self._buffer = bytearray()
 
     def __str__(self):
         return self.read()
@@ -1297,25 +1381,44 @@ class ResponseReader(io.RawIOBase):
     @property
     def empty(self):
         """Indicates whether there is any more data in the response."""
-        return self.peek(1) == b""
+        return not self.peek(1)
 
-    def peek(self, size):
-        """Nondestructively retrieves a given number of characters.
+    def peek(self, size=1):
+        """Nondestructively retrieves at least a given number of characters.
 
         The next :meth:`read` operation behaves as though this method was never
-        called.
+        called. Like :meth:`io.BufferedReader.peek`, this method returns all
+        characters buffered so far, which may be more than requested. If fewer
+        are buffered, a block of at least ``size`` characters is read from the
+        response, so that :meth:`readline` doesn't read character by character.
+        Fewer characters are only returned at the end of the response.
 
         :param size: The number of characters to retrieve.
         :type size: ``integer``
         """
-        c = self.read(size)
-        self._buffer = self._buffer + c
-        return c
+        if len(self._buffer) < size:
+            # read1 returns what is available rather than waiting for the whole block, e.g. on a stream of results
+            read = getattr(self._response, 'read1', self._response.read)
+            block_size = max(size, self._block_size)
+            while len(self._buffer) < size:
+                data = read(block_size - len(self._buffer))
+                if not data:
+                    break
+                self._buffer += data
+            self._check_consumed()
+        return bytes(self._buffer)
 
     def close(self):
-        """Closes this response."""
+        """Closes this response.
+
+        A pooled connection is returned to its pool if the response was read to the end. Otherwise it is closed.
+        """
         if self._connection:
-            self._connection.close()
+            if self._release is not None and self._response.isclosed():
+                self._release_connection()
+            else:
+                self._connection.close()
+                self._connection = None
         self._response.close()
 
     def read(self, size = None):
@@ -1326,13 +1429,30 @@ class ResponseReader(io.RawIOBase):
         :type size: ``integer`` or "None"
 
         """
-        r = self._buffer
-        self._buffer = b''
-        if size is not None:
-            size -= len(r)
-        r = r + self._response.read(size)
+        buffered = len(self._buffer)
+
+        if buffered == 0:
+            r = self._response.read(size)
+        elif size is not None and size <= buffered:
+            r = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return r
+        else:
+            r = bytes(self._buffer) + self._response.read(None if size is None else size - buffered)
+            self._buffer = bytearray()
+
+        self._check_consumed()
         return r
 
+    def _check_consumed(self):
+        if self._release is not None and self._connection is not None and self._response.isclosed():
+            # The response has been consumed, so the connection can serve the next request
+            self._release_connection()
+
+    def _release_connection(self):
+        connection, self._connection = self._connection, None
+        self._release(connection)
+
     def readable(self):
         """ Indicates that the response reader is readable."""
         return True
@@ -1340,21 +1460,134 @@ class ResponseReader(io.RawIOBase):
     def readinto(self, byte_array):
         """ Read data into a byte array, upto the size of the byte array.
 
+        Peeked characters are served first. Otherwise the response writes
+        straight into ``byte_array`` without an intermediate copy.
+
         :param byte_array: A byte array/memory view to pour bytes into.
         :type byte_array: ``bytearray`` or ``memoryview``
 
         """
         max_size = len(byte_array)
-        data = self.read(max_size)
-        bytes_read = len(data)
-        byte_array[:bytes_read] = data
+        buffered = len(self._buffer)
+
+        if buffered > 0:
+            bytes_read = min(buffered, max_size)
+            byte_array[:bytes_read] = self._buffer[:bytes_read]
+            del self._buffer[:bytes_read]
+            return bytes_read
+
+        readinto = getattr(self._response, 'readinto', None)
+
+        if readinto is None:
+            # Python 2 httplib responses can only read
+            data = self._response.read(max_size)
+            bytes_read = len(data)
+            byte_array[:bytes_read] = data
+        else:
+            bytes_read = readinto(byte_array)
+
+        self._check_consumed()
         return bytes_read
 
 
-def handler(key_file=None, cert_file=None, timeout=None, verify=False):
+# Methods a request may be sent again with, if a reused connection turns out to be closed by the server. Other methods
+# may change state on the server, so a request that might have reached it is never sent twice.
+_RETRYABLE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+def _nothing_received(error):
+    """Returns whether ``error`` means that the server closed the connection without sending any part of a response."""
+    remote_disconnected = getattr(six.moves.http_client, 'RemoteDisconnected', None)  # Python 3
+    if remote_disconnected is not None and isinstance(error, remote_disconnected):
+        return True
+    # Python 2 reports an empty status line as BadStatusLine("''")
+    return isinstance(error, six.moves.http_client.BadStatusLine) and error.line in ('', "''")
+
+
+def _is_stale(connection):
+    """Returns whether an idle connection can't be reused.
+
+    An idle connection has nothing to read, unless the server closed it (end of file) or sent something unexpected.
+    """
+    sock = connection.sock
+    if sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (ValueError, select.error, socket.error):
+        return True
+    return len(readable) > 0
+
+
+class _ConnectionPool(object):
+    """Keeps idle HTTP connections per ``(scheme, host, port)`` for reuse.
+
+    At most ``max_connections`` idle connections are kept per key; surplus connections are closed when they are
+    released. Connections that have been idle for ``idle_timeout`` seconds or more, or that the server has closed in
+    the meantime, are closed instead of reused.
+    """
+    def __init__(self, connect, max_connections, idle_timeout):
+        self._connect = connect
+        self._max_connections = max_connections
+        self._idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Returns a pair of a connection for ``key`` and whether it was taken from the pool."""
+        expired = []
+        connection = None
+        now = time.time()
+
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                candidate, released = idle.pop()
+                if now - released < self._idle_timeout and not _is_stale(candidate):
+                    connection = candidate
+                    break
+                expired.append(candidate)
+
+        for candidate in expired:
+            candidate.close()
+
+        if connection is not None:
+            return connection, True
+
+        return self._connect(*key), False
+
+    def release(self, key, connection):
+        now = time.time()
+
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self._max_connections:
+                idle.append((connection, now))
+                return
+
+        connection.close()
+
+    def clear(self):
+        """Closes all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for connections in six.itervalues(idle):
+            for connection, _ in connections:
+                connection.close()
+
+
+def handler(key_file=None, cert_file=None, timeout=None, verify=False, max_connections=8, idle_timeout=10):
     """This class returns an instance of the default HTTP request handler using
     the values you provide.
 
+    Connections are kept alive and reused by later requests to the same scheme, host, and port. A connection goes
+    back to the pool once its response has been read to the end or closed. The handler is thread-safe.
+
+    A server may close an idle connection just as it is reused. If sending the request on it fails, the request is sent
+    again on a new connection. GET, HEAD, and OPTIONS requests are also sent again, if the server closed the connection
+    without responding. Timeouts and other requests are never retried, since the server might have processed them.
+
     :param `key_file`: A path to a PEM (Privacy Enhanced Mail) formatted file containing your private key (optional).
     :type key_file: ``string``
     :param `cert_file`: A path to a PEM (Privacy Enhanced Mail) formatted file containing a certificate chain file (optional).
@@ -1363,7 +1596,20 @@ def handler(key_file=None, cert_file=None, timeout=None, verify=False):
     :type timeout: ``integer`` or "None"
     :param `verify`: Set to False to disable SSL verification on https connections.
     :type verify: ``Boolean``
+    :param `max_connections`: The number of idle connections kept per host. Set to 0 to open a new connection for
+        every request, which is closed afterwards.
+    :type max_connections: ``integer``
+    :param `idle_timeout`: The number of seconds after which an idle connection is no longer reused. The default
+        of 10 is below the 12 seconds after which splunkd closes idle connections (``busyKeepAliveIdleTimeout``).
+    :type idle_timeout: ``integer``
     """
+    # Creating an SSL context loads the trusted certificates, so all connections share one
+    if verify:
+        context = ssl.create_default_context()
+    else:
+        context = ssl._create_unverified_context()
+    if cert_file is not None:
+        context.load_cert_chain(cert_file, key_file)
 
     def connect(scheme, host, port):
         kwargs = {}
@@ -1371,14 +1617,27 @@ def handler(key_file=None, cert_file=None, timeout=None, verify=False):
         if scheme == "http":
             return six.moves.http_client.HTTPConnection(host, port, **kwargs)
         if scheme == "https":
-            if key_file is not None: kwargs['key_file'] = key_file
-            if cert_file is not None: kwargs['cert_file'] = cert_file
-
-            if not verify:
-                kwargs['context'] = ssl._create_unverified_context()
-            return six.moves.http_client.HTTPSConnection(host, port, **kwargs)
+            return six.moves.http_client.HTTPSConnection(host, port, context=context, **kwargs)
         raise ValueError("unsupported scheme: %s" % scheme)
 
+    pool = _ConnectionPool(connect, max_connections, idle_timeout) if max_connections > 0 else None
+
+    def send(connection, method, path, body, head, reused):
+        """Returns the response or, if ``reused`` and the request may be sent again on a new connection, None."""
+        sent = False
+        try:
+            connection.request(method, path, body, head)
+            sent = True
+            if timeout is not None:
+                connection.sock.settimeout(timeout)
+            return connection.getresponse()
+        except socket.timeout:
+            raise
+        except (six.moves.http_client.BadStatusLine, socket.error) as error:
+            if reused and (not sent or (method in _RETRYABLE_METHODS and _nothing_received(error))):
+                return None
+            raise
+
     def request(url, message, **kwargs):
         scheme, host, port, path = _spliturl(url)
         body = message.get("body", "")
@@ -1387,29 +1646,43 @@ def handler(key_file=None, cert_file=None, timeout=None, verify=False):
             "Host": host,
             "User-Agent": "splunk-sdk-python/1.6.16",
             "Accept": "*/*",
-            "Connection": "Close",
+            "Connection": "Close" if pool is None else "Keep-Alive",
         } # defaults
         for key, value in message["headers"]:
             head[key] = value
         method = message.get("method", "GET")
 
-        connection = connect(scheme, host, port)
+        if pool is None:
+            connection, reused = connect(scheme, host, port), False
+        else:
+            key = scheme, host, port
+            connection, reused = pool.acquire(key)
+
         is_keepalive = False
         try:
-            connection.request(method, path, body, head)
-            if timeout is not None:
-                connection.sock.settimeout(timeout)
-            response = connection.getresponse()
-            is_keepalive = "keep-alive" in response.getheader("connection", default="close").lower()
+            response = send(connection, method, path, body, head, reused)
+            if response is None:
+                # The server closed the idle connection as we reused it
+                connection.close()
+                connection = connect(scheme, host, port)
+                response = send(connection, method, path, body, head, False)
+            is_keepalive = not response.will_close
         finally:
             if not is_keepalive:
                 connection.close()
 
+        if pool is not None and is_keepalive:
+            reader = ResponseReader(response, connection, lambda connection: pool.release(key, connection))
+            if response.isclosed():
+                reader.close()  # e.g. an empty body, there is nothing to wait for
+        else:
+            reader = ResponseReader(response, connection if is_keepalive else None)
+
         return {
             "status": response.status,
             "reason": response.reason,
             "headers": response.getheaders(),
-            "body": ResponseReader(response, connection if is_keepalive else None),
+            "body": reader,
         }
 
     return request
@@ -60,17 +60,21 @@ attributes, and methods that are specific to each kind of entity. For example::
 
 import contextlib
 import datetime
+import errno
 import json
 import logging
 import socket
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from time import sleep
+from io import BytesIO
+from time import sleep, time
 
 from splunklib import six
 from splunklib.six.moves import urllib
 
 from . import data
-from .binding import (Context, HTTPError, UrlEncoded,
+from .binding import (Context, HTTPError, ResponseReader, UrlEncoded,
                       _encode, _make_cookie_header, _NoAuthenticationToken,
                       namespace)
 from .data import record
@@ -195,6 +199,98 @@ def _path(base, name):
     return base + name
 
 
+# Calls the given function on a background thread; result() waits for it to
+# return and returns its value or raises its exception
+class _BackgroundCall(object):
+    def __init__(self, function, *args):
+        self._function = function
+        self._args = args
+        self._value = None
+        self._exception = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._value = self._function(*self._args)
+        except Exception as e:
+            self._exception = e
+
+    def result(self):
+        self._thread.join()
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+
+# Keeps the bodies of successful GET responses for a Service, evicting the
+# least recently used entry once there are more than max_entries. An entry
+# is served as is for ttl seconds and revalidated with its ETag after that.
+class _ResponseCache(object):
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def store(self, key, response, body):
+        etag = None
+        for name, value in response.headers:
+            if name.lower() == 'etag':
+                etag = value
+        entry = record({
+            'status': response.status,
+            'reason': response.reason,
+            'headers': response.headers,
+            'body': body,
+            'etag': etag,
+            'expires': time() + self.ttl})
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def renew(self, entry):
+        entry.expires = time() + self.ttl
+
+    def invalidate(self, path):
+        # A change to an entity shows in the collections above it and in the
+        # entities below it, in every namespace
+        path = _namespace_free(path)
+        with self._lock:
+            for key in list(self._entries):
+                cached = _namespace_free(key[0])
+                if cached.startswith(path) or path.startswith(cached):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Strip the /services/ or /servicesNS/{owner}/{app}/ prefix off the given
+# absolute path, and make it end with a slash. A path too short to hold the
+# whole prefix is returned as it is.
+def _namespace_free(path):
+    path = urllib.parse.unquote(path).rstrip('/') + '/'
+    if path.startswith('/servicesNS/'):
+        parts = path.split('/', 4)
+        return parts[4] if len(parts) == 5 else path
+    if path.startswith('/services/'):
+        return path[len('/services/'):]
+    return path
+
+
 # Load an atom record from the body of the given response
 # this will ultimately be sent to an xml ElementTree so we
 # should use the xmlcharrefreplace option
@@ -223,6 +319,37 @@ def _load_atom_entries(response):
         return entries if isinstance(entries, list) else [entries]
 
 
+# Iterate over the atom entries in the body of the given response, loading
+# one entry at a time instead of the whole feed. The response is closed once
+# the iteration ends, even if it ends early.
+def _iter_atom_entries(response):
+    try:
+        for entry in data.load_entries(response.body):
+            yield entry
+    finally:
+        response.body.close()
+
+
+# The fields of a job's state that are polled while waiting for it, see Job.wait
+_JOB_STATUS_FIELDS = ['dispatchState', 'isDone', 'isFailed', 'doneProgress', 'eventCount', 'resultCount',
+                      'runDuration']
+
+
+# Load the status of a job from the JSON body of a response to a GET of the
+# job with output_mode=json and f=_JOB_STATUS_FIELDS, or return None if the
+# job isn't ready to report it yet
+def _load_job_status(body):
+    if len(body) == 0:
+        return None
+    entries = json.loads(body.decode('utf-8')).get('entry')
+    if not entries:
+        return None
+    status = record(entries[0]['content'])
+    status['isDone'] = status.get('isDone') in (True, 1, '1')
+    status['isFailed'] = status.get('isFailed') in (True, 1, '1')
+    return status
+
+
 # Load the sid from the body of the given response
 def _load_sid(response):
     return _load_atom(response).response.sid
@@ -384,6 +511,13 @@ class Service(_BaseService):
     :param `password`: The password, which is used to authenticate the Splunk
                        instance.
     :type password: ``string``
+    :param `cache_ttl`: The number of seconds to serve cached GET responses
+                        without revalidating them (optional; the default,
+                        ``None``, disables the cache). See :meth:`get`.
+    :type cache_ttl: ``integer``
+    :param `cache_size`: The maximum number of cached GET responses (optional;
+                         the default is 256).
+    :type cache_size: ``integer``
     :return: A :class:`Service` instance.
 
     **Example**::
@@ -401,6 +535,96 @@ class Service(_BaseService):
     def __init__(self, **kwargs):
         super(Service, self).__init__(**kwargs)
         self._splunk_version = None
+        cache_ttl = kwargs.get("cache_ttl")
+        self._cache = None if cache_ttl is None else _ResponseCache(cache_ttl, kwargs.get("cache_size", 256))
+
+    # Search jobs change on their own, so they are never cached
+    _uncached_paths = ('search/jobs/',)
+
+    def get(self, path_segment, owner=None, app=None, headers=None, sharing=None, **query):
+        """Performs a GET operation from the REST path segment with the given
+        namespace and query, as :meth:`splunklib.binding.Context.get` does.
+
+        If the service was created with ``cache_ttl``, successful responses
+        are cached by path, namespace, and query. A cached response is
+        returned without a round trip for ``cache_ttl`` seconds. After that
+        it is revalidated with ``If-None-Match`` when the server sent an
+        ``ETag``, and fetched again otherwise. At most ``cache_size`` (the
+        default is 256) responses are kept, least recently used first out.
+        A POST or DELETE invalidates the cached responses of its path, of the
+        paths above it, and of the paths below it. Requests with their own
+        *headers* and search jobs are never cached.
+        """
+        if self._cache is None or headers:
+            return super(Service, self).get(path_segment, owner=owner, app=app, headers=headers, sharing=sharing,
+                                            **query)
+        path = self._abspath(path_segment, owner=owner, app=app, sharing=sharing)
+        if _namespace_free(path).startswith(self._uncached_paths):
+            return super(Service, self).get(path_segment, owner=owner, app=app, sharing=sharing, **query)
+
+        key = (path, tuple(sorted((k, repr(v)) for k, v in six.iteritems(query))))
+        entry = self._cache.lookup(key)
+        if entry is not None and entry.expires > time():
+            return self._cached_response(entry)
+
+        headers = [] if entry is None or entry.etag is None else [('If-None-Match', entry.etag)]
+        response = super(Service, self).get(path_segment, owner=owner, app=app, headers=headers, sharing=sharing,
+                                            **query)
+        if response.status == 304 and entry is not None:
+            response.body.read()
+            self._cache.renew(entry)
+            return self._cached_response(entry)
+        if response.status != 200:
+            return response
+        return self._cached_response(self._cache.store(key, response, response.body.read()))
+
+    @staticmethod
+    def _cached_response(entry):
+        return record({
+            'status': entry.status,
+            'reason': entry.reason,
+            'headers': entry.headers,
+            'body': ResponseReader(BytesIO(entry.body))})
+
+    def post(self, path_segment, owner=None, app=None, sharing=None, headers=None, **query):
+        """Performs a POST operation as :meth:`splunklib.binding.Context.post`
+        does, and drops the cached responses it may change (see :meth:`get`).
+        """
+        try:
+            return super(Service, self).post(path_segment, owner=owner, app=app, sharing=sharing, headers=headers,
+                                             **query)
+        finally:
+            self._invalidate(path_segment, owner, app, sharing)
+
+    def delete(self, path_segment, owner=None, app=None, sharing=None, **query):
+        """Performs a DELETE operation as :meth:`splunklib.binding.Context.delete`
+        does, and drops the cached responses it may change (see :meth:`get`).
+        """
+        try:
+            return super(Service, self).delete(path_segment, owner=owner, app=app, sharing=sharing, **query)
+        finally:
+            self._invalidate(path_segment, owner, app, sharing)
+
+    def request(self, path_segment, method="GET", headers=None, body="", owner=None, app=None, sharing=None):
+        """Issues an HTTP request as :meth:`splunklib.binding.Context.request`
+        does, and drops the cached responses that a request other than a GET
+        may change (see :meth:`get`).
+        """
+        try:
+            return super(Service, self).request(path_segment, method=method, headers=headers, body=body,
+                                                owner=owner, app=app, sharing=sharing)
+        finally:
+            if method.upper() != "GET":
+                self._invalidate(path_segment, owner, app, sharing)
+
+    def _invalidate(self, path_segment, owner, app, sharing):
+        if self._cache is not None:
+            self._cache.invalidate(self._abspath(path_segment, owner=owner, app=app, sharing=sharing))
+
+    def clear_cache(self):
+        """Drops all the responses cached for this service (see :meth:`get`)."""
+        if self._cache is not None:
+            self._cache.clear()
 
     @property
     def apps(self):
@@ -1339,21 +1563,24 @@ class ReadOnlyCollection(Endpoint):
         that is, an XML document with a toplevel element ``<feed>``,
         and within that element one or more ``<entry>`` elements.
         """
+        return list(self._iter_list(response))
+
+    def _iter_list(self, response):
+        """Converts *response* to entities one at a time.
+
+        This is the streaming counterpart of :meth:`_load_list`. The Atom
+        feed in *response* is parsed incrementally, so only the entry being
+        converted is held in memory.
+        """
         # Some subclasses of Collection have to override this because
         # splunkd returns something that doesn't match
         # <feed><entry></entry><feed>.
-        entries = _load_atom_entries(response)
-        if entries is None: return []
-        entities = []
-        for entry in entries:
+        for entry in _iter_atom_entries(response):
             state = _parse_atom_entry(entry)
-            entity = self.item(
+            yield self.item(
                 self.service,
                 self._entity_path(state),
                 state=state)
-            entities.append(entity)
-
-        return entities
 
     def itemmeta(self):
         """Returns metadata for members of the collection.
@@ -1394,19 +1621,30 @@ class ReadOnlyCollection(Endpoint):
         content = _load_atom(response, MATCH_ENTRY_CONTENT)
         return _parse_atom_metadata(content)
 
-    def iter(self, offset=0, count=None, pagesize=None, **kwargs):
+    def iter(self, offset=0, count=None, pagesize=None, readahead=0, **kwargs):
         """Iterates over the collection.
 
         This method is equivalent to the :meth:`list` method, but
         it returns an iterator and can load a certain number of entities at a
         time from the server.
 
+        With *pagesize* and *readahead* set, the next *readahead* pages are
+        requested in the background while the current page is consumed, so
+        network latency overlaps with processing. At most *readahead* pages
+        are held in memory besides the current one. Pages that spend more time
+        waiting for the server than transferring entities double in size, up
+        to eight times *pagesize*, which cuts the number of round trips to
+        remote servers.
+
         :param offset: The index of the first entity to return (optional).
         :type offset: ``integer``
         :param count: The maximum number of entities to return (optional).
         :type count: ``integer``
         :param pagesize: The number of entities to load (optional).
         :type pagesize: ``integer``
+        :param readahead: The number of pages to request ahead of the current
+            one (optional, the default is 0).
+        :type readahead: ``integer``
         :param kwargs: Additional arguments (optional):
 
             - "search" (``string``): The search query to filter responses.
@@ -1429,23 +1667,78 @@ class ReadOnlyCollection(Endpoint):
                 # Loads 10 saved searches at a time from the
                 # server.
                 ...
+            for saved_search in s.saved_searches.iter(pagesize=100, readahead=2):
+                # Loads the next two pages while this one is processed.
+                ...
         """
         assert pagesize is None or pagesize > 0
+        assert readahead >= 0
         if count is None:
             count = self.null_count
+        if pagesize is not None and readahead > 0:
+            for item in self._iter_read_ahead(offset, count, pagesize, readahead, kwargs):
+                yield item
+            return
         fetched = 0
         while count == self.null_count or fetched < count:
             response = self.get(count=pagesize or count, offset=offset, **kwargs)
-            items = self._load_list(response)
-            N = len(items)
-            fetched += N
-            for item in items:
+            N = 0
+            for item in self._iter_list(response):
+                N += 1
                 yield item
+            fetched += N
             if pagesize is None or N < pagesize:
                 break
             offset += N
             logging.debug("pagesize=%d, fetched=%d, offset=%d, N=%d, kwargs=%s", pagesize, fetched, offset, N, kwargs)
 
+    def _iter_read_ahead(self, offset, count, pagesize, readahead, kwargs):
+        max_pagesize = pagesize * 8
+        remaining = None if count == self.null_count else count
+        if remaining == 0:
+            return
+
+        # The first page is fetched in the foreground, so that an autologin
+        # happens once before the background requests start
+        size = pagesize if remaining is None else min(pagesize, remaining)
+        response, latency, transfer = self._fetch_page(offset, size, kwargs)
+        offset += size
+        requested = size
+        pages = deque()
+
+        while True:
+            # Adapt the size of the pages that haven't been requested yet
+            if latency > transfer and pagesize < max_pagesize:
+                pagesize = min(pagesize * 2, max_pagesize)
+
+            while len(pages) < readahead and (remaining is None or requested < remaining):
+                next_size = pagesize if remaining is None else min(pagesize, remaining - requested)
+                pages.append((next_size, _BackgroundCall(self._fetch_page, offset, next_size, kwargs)))
+                offset += next_size
+                requested += next_size
+
+            N = 0
+            for item in self._iter_list(response):
+                N += 1
+                yield item
+            logging.debug("pagesize=%d, offset=%d, N=%d, kwargs=%s", size, offset, N, kwargs)
+
+            # A short page is the last one; pages requested beyond it are dropped
+            if N < size or len(pages) == 0:
+                break
+            size, page = pages.popleft()
+            response, latency, transfer = page.result()
+
+    def _fetch_page(self, offset, count, kwargs):
+        # Reads the whole page, so that its connection is free for the next
+        # request, and times the wait for the response separately from the
+        # transfer of its body
+        start = time()
+        response = self.get(count=count, offset=offset, **kwargs)
+        received = time()
+        response.body = BytesIO(response.body.read())
+        return response, received - start, time() - received
+
     # kwargs: count, offset, search, sort_dir, sort_key, sort_mode
     def list(self, count=None, **kwargs):
         """Retrieves a list of entities in this collection.
@@ -2527,10 +2820,8 @@ class Inputs(Collection):
                 if he.status == 404: # No inputs of this kind
                     return []
             entities = []
-            entries = _load_atom_entries(response)
-            if entries is None:
-                return [] # No inputs in a collection comes back with no feed or entry in the XML
-            for entry in entries:
+            # No inputs in a collection comes back with no feed or entry in the XML
+            for entry in _iter_atom_entries(response):
                 state = _parse_atom_entry(entry)
                 # Unquote the URL, since all URL encoded in the SDK
                 # should be of type UrlEncoded, and all str should not
@@ -2554,9 +2845,7 @@ class Inputs(Collection):
                 else:
                     raise
 
-            entries = _load_atom_entries(response)
-            if entries is None: continue # No inputs to process
-            for entry in entries:
+            for entry in _iter_atom_entries(response):
                 state = _parse_atom_entry(entry)
                 # Unquote the URL, since all URL encoded in the SDK
                 # should be of type UrlEncoded, and all str should not
@@ -2719,6 +3008,60 @@ class Job(Entity):
         ready = self._state.content['dispatchState'] not in ['QUEUED', 'PARSING']
         return ready
 
+    def wait(self, timeout=None, on_progress=None, min_interval=0.05, max_interval=2):
+        """Waits for this job to finish.
+
+        Unlike :meth:`is_done`, which fetches the whole state of the job, each
+        poll only asks for the job's status as JSON. Polls start
+        *min_interval* seconds apart and back off exponentially to
+        *max_interval* seconds, so short searches return quickly while long
+        ones don't load the server. The last wait is cut short at *timeout*.
+
+        :param timeout: The maximum number of seconds to wait (optional; the
+            default is to wait until the job finishes).
+        :type timeout: ``float``
+        :param on_progress: A function called with the status of the job
+            after each poll (optional). The status is a
+            :class:`splunklib.data.Record` of the fields ``dispatchState``,
+            ``isDone``, ``isFailed``, ``doneProgress``, ``eventCount``,
+            ``resultCount``, and ``runDuration``.
+        :type on_progress: ``function``
+        :param min_interval: The number of seconds before the second poll.
+        :type min_interval: ``float``
+        :param max_interval: The maximum number of seconds between polls.
+        :type max_interval: ``float``
+        :raises OperationError: Raised when the job doesn't finish within
+            *timeout* seconds.
+        :return: The :class:`Job`.
+
+        **Example**::
+
+            def report(status):
+                print "%d%% done" % (float(status.doneProgress) * 100)
+            job = service.jobs.create("search * | head 5")
+            job.wait(on_progress=report)
+            rr = results.ResultsReader(job.results())
+        """
+        deadline = None if timeout is None else time() + timeout
+        interval = min_interval
+
+        while True:
+            response = self.get(output_mode='json', f=_JOB_STATUS_FIELDS)
+            status = _load_job_status(response.body.read())
+            if status is not None:
+                if on_progress is not None:
+                    on_progress(status)
+                if status.isDone:
+                    return self
+            if deadline is None:
+                sleep(interval)
+            else:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    raise OperationError("Job %s did not finish within %s seconds." % (self.sid, timeout))
+                sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+
     @property
     def name(self):
         """Returns the name of the search job, which is the search ID (SID).
@@ -2743,11 +3086,9 @@ class Job(Entity):
 
             import splunklib.client as client
             import splunklib.results as results
-            from time import sleep
             service = client.connect(...)
             job = service.jobs.create("search * | head 5")
-            while not job.is_done():
-                sleep(.2)
+            job.wait()
             rr = results.ResultsReader(job.results())
             for result in rr:
                 if isinstance(result, results.Message):
@@ -2758,6 +3099,9 @@ class Job(Entity):
                     print result
             assert rr.is_preview == False
 
+        Results requested with ``output_mode='json'`` are read the same way
+        with the faster :class:`splunklib.results.JSONResultsReader`.
+
         Results are not available until the job has finished. If called on
         an unfinished job, the result is an empty event set.
 
@@ -2910,19 +3254,14 @@ class Jobs(Collection):
         # Collection is 0, not -1 as it is on most.
         self.null_count = 0
 
-    def _load_list(self, response):
+    def _iter_list(self, response):
         # Overridden because Job takes a sid instead of a path.
-        entries = _load_atom_entries(response)
-        if entries is None: return []
-        entities = []
-        for entry in entries:
+        for entry in _iter_atom_entries(response):
             state = _parse_atom_entry(entry)
-            entity = self.item(
+            yield self.item(
                 self.service,
                 entry['content']['sid'],
                 state=state)
-            entities.append(entity)
-        return entities
 
     def create(self, query, **kwargs):
         """ Creates a search using a search query and any additional parameters
@@ -2963,6 +3302,9 @@ class Jobs(Collection):
                     print result
             assert rr.is_preview == False
 
+        With ``output_mode='json'``, pass the handle to
+        :class:`splunklib.results.JSONResultsReader` instead.
+
         Running an export search is more efficient as it streams the results
         directly to you, rather than having to write them out to disk and make
         them available later. As soon as results are ready, you will receive
@@ -3735,3 +4077,103 @@ class KVStoreCollectionData(object):
         data = json.dumps(documents)
 
         return json.loads(self._post('batch_save', headers=KVStoreCollectionData.JSON_HEADER, body=data).body.read().decode('utf-8'))
+
+    def bulk_save(self, documents, max_documents=1000, max_size=50 * 1024 * 1024, max_workers=4, retries=2):
+        """
+        Inserts or updates every document in an iterable of any length.
+
+        The documents are split into batches of at most *max_documents* documents and *max_size* bytes of JSON, the
+        limits set by ``max_documents_per_batch_save`` and ``max_size_per_batch_save_mb`` in the ``[kvstore]`` stanza
+        of limits.conf. Up to *max_workers* batches are posted concurrently, and only those are held in memory. A batch
+        whose connection is refused is retried up to *retries* times with exponential backoff. So is a batch that fails
+        with a server error (5xx), if all of its documents have a ``_key``. A server error may follow saving part of
+        a batch, and retrying would insert documents without a ``_key`` twice. Other errors, like timeouts, leave open
+        whether the batch was saved, so they are not retried.
+
+        If a batch still fails, its error is raised once the batches in flight are done. The batches before it have
+        been saved.
+
+        :param documents: Documents to save as dictionaries
+        :type documents: ``iterable`` of ``dict``
+        :param max_documents: Maximum number of documents per batch
+        :type max_documents: ``integer``
+        :param max_size: Maximum size of a batch in bytes
+        :type max_size: ``integer``
+        :param max_workers: Maximum number of batches posted concurrently
+        :type max_workers: ``integer``
+        :param retries: Number of times a failed batch is retried
+        :type retries: ``integer``
+
+        :return: Keys of the saved documents, in the order of *documents*
+        :rtype: ``list``
+        """
+        if max_documents < 1:
+            raise ValueError("Invalid max_documents: %s" % repr(max_documents))
+        if max_workers < 1:
+            raise ValueError("Invalid max_workers: %s" % repr(max_workers))
+
+        keys = []
+        pending = deque()
+        error = None
+
+        for batch, keyed in self._batches(documents, max_documents, max_size):
+            if len(pending) == max_workers or (len(keys) == 0 and len(pending) == 1):
+                # The first batch is saved before any other is posted, so that an autologin happens once
+                try:
+                    keys.extend(pending.popleft().result())
+                except Exception as e:
+                    error = e
+                    break
+            pending.append(_BackgroundCall(self._save_batch, batch, retries if keyed else 0, retries))
+
+        while len(pending) > 0:
+            try:
+                keys.extend(pending.popleft().result())
+            except Exception as e:
+                if error is None:
+                    error = e
+
+        if error is not None:
+            raise error
+
+        return keys
+
+    @staticmethod
+    def _batches(documents, max_documents, max_size):
+        # Yields each batch as JSON along with whether all of its documents have a _key
+        batch = []
+        size = 2
+        keyed = True
+
+        for document in documents:
+            has_key = '_key' in document
+            document = json.dumps(document)
+            if len(batch) > 0 and (len(batch) == max_documents or size + 1 + len(document) > max_size):
+                yield '[' + ','.join(batch) + ']', keyed
+                batch = []
+                size = 2
+                keyed = True
+            batch.append(document)
+            size += len(document) + (len(batch) > 1)
+            keyed = keyed and has_key
+
+        if len(batch) > 0:
+            yield '[' + ','.join(batch) + ']', keyed
+
+    def _save_batch(self, data, server_error_retries, retries):
+        attempt = 0
+
+        while True:
+            try:
+                response = self._post('batch_save', headers=KVStoreCollectionData.JSON_HEADER, body=data)
+                return json.loads(response.body.read().decode('utf-8'))
+            except (HTTPError, socket.error) as e:
+                # A refused connection is the only connection error that rules out the batch reaching the server
+                if isinstance(e, HTTPError):
+                    retryable = e.status >= 500 and attempt < server_error_retries
+                else:
+                    retryable = e.errno == errno.ECONNREFUSED and attempt < retries
+                if not retryable:
+                    raise
+            sleep(0.5 * 2 ** attempt)
+            attempt += 1
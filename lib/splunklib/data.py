@@ -17,11 +17,12 @@ format, which is the format used by most of the REST API.
 """
 
 from __future__ import absolute_import
+import codecs
 import sys
-from xml.etree.ElementTree import XML
+from xml.etree.ElementTree import XML, iterparse
 from splunklib import six
 
-__all__ = ["load"]
+__all__ = ["load", "load_entries"]
 
 # LNAME refers to element names without namespaces; XNAME is the same
 # name, but with an XML namespace.
@@ -92,6 +93,83 @@ def load(text, match=None):
     else:
         return [load_root(item, nametable) for item in items]
 
+def load_entries(stream):
+    """This function reads an Atom Feed from a stream and yields its entries
+    one at a time, each in the native Python structure that :func:`load` 
+    would give it.
+
+    The feed is parsed incrementally and every entry is discarded once it has
+    been loaded, so only one entry is held in memory at a time. A document
+    whose root element is an entry yields that entry. A feed whose
+    ``totalResults`` is 0 yields nothing. The text is read as UTF-8, and
+    invalid byte sequences are replaced with U+FFFD.
+
+    :param stream: A stream of the XML text to load (any object that supports
+        ``.read()`` and returns bytes).
+    """
+    # The XML parser rejects whitespace in front of the declaration
+    head = b""
+    while len(head) == 0:
+        chunk = stream.read(_CHUNK_SIZE)
+        if len(chunk) == 0: return
+        head = chunk.lstrip()
+
+    root = None
+    depth = 0
+
+    for event, element in iterparse(_Utf8Stream(_PrefixedStream(head, stream)), events=('start', 'end')):
+        if event == 'start':
+            if root is None: root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            if localname(element.tag) == 'entry':
+                yield load_elem(element)[1]
+        elif depth == 1:
+            name = localname(element.tag)
+            if name == 'entry':
+                if localname(root.tag) == 'feed':
+                    yield load_elem(element)[1]
+                root.remove(element)
+            elif name == 'totalResults' and element.text is not None and element.text.strip() == '0':
+                # Need this to handle a random case in the REST API
+                return
+
+_CHUNK_SIZE = 16 * 1024
+
+# Replays the given bytes before the rest of the stream
+class _PrefixedStream(object):
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size=-1):
+        prefix = self._prefix
+        if len(prefix) == 0:
+            return self._stream.read(size)
+        if size is None or size < 0:
+            self._prefix = b""
+            return prefix + self._stream.read()
+        self._prefix = prefix[size:]
+        return prefix[:size]
+
+# Replaces invalid UTF-8 in the given stream, which the XML parser would
+# reject
+class _Utf8Stream(object):
+    def __init__(self, stream):
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    def read(self, size=-1):
+        while True:
+            data = self._stream.read(size)
+            text = self._decoder.decode(data, final=len(data) == 0)
+            # An incomplete character at the end of data is decoded with the
+            # next read
+            if len(text) > 0 or len(data) == 0:
+                return text.encode('utf-8')
+
 # Load the attributes of the given element.
 def load_attrs(element):
     if not hasattrs(element): return None
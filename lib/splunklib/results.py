@@ -30,10 +30,17 @@ as follows:::
     for item in reader:
         print(item)
     print "Results are a preview: %s" % reader.is_preview
+
+Results requested with ``output_mode=json`` or ``output_mode=json_rows`` are
+read the same way with :class:`JSONResultsReader`, which is considerably
+cheaper to parse than XML.
 """
 
 from __future__ import absolute_import
 
+import codecs
+import json
+import re
 from io import BytesIO
 
 from splunklib import six
@@ -54,6 +61,7 @@ except:
 
 __all__ = [
     "ResultsReader",
+    "JSONResultsReader",
     "Message"
 ]
 
@@ -100,15 +108,15 @@ class _ConcatenatedStream(object):
 
         If *n* is ``None``, return all available characters.
         """
-        response = b""
+        response = []
         while len(self.streams) > 0 and (n is None or n > 0):
             txt = self.streams[0].read(n)
-            response += txt
+            response.append(txt)
             if n is not None:
                 n -= len(txt)
             if n is None or n > 0:
                 del self.streams[0]
-        return response
+        return b"".join(response)
 
 class _XMLDTDFilter(object):
     """Lazily remove all XML DTDs from a stream.
@@ -125,34 +133,58 @@ class _XMLDTDFilter(object):
     """
     def __init__(self, stream):
         self.stream = stream
+        self._filtered = bytearray()  # filtered characters not returned yet
+        self._tail = b""              # a trailing "<" that may start a DTD in the next block
+        self._in_dtd = False
+        self._eof = False
 
     def read(self, n=None):
         """Read at most *n* characters from this stream.
 
         If *n* is ``None``, return all available characters.
         """
-        response = b""
-        while n is None or n > 0:
-            c = self.stream.read(1)
-            if c == b"":
-                break
-            elif c == b"<":
-                c += self.stream.read(1)
-                if c == b"<?":
-                    while True:
-                        q = self.stream.read(1)
-                        if q == b">":
-                            break
-                else:
-                    response += c
-                    if n is not None:
-                        n -= len(c)
+        while not self._eof and (n is None or len(self._filtered) < n):
+            block = self.stream.read(None if n is None else n - len(self._filtered))
+            if block == b"":
+                self._eof = True
+                if not self._in_dtd:
+                    self._filtered += self._tail
+                self._tail = b""
             else:
-                response += c
-                if n is not None:
-                    n -= 1
+                self._filter(self._tail + block)
+
+        if n is None or n >= len(self._filtered):
+            response = bytes(self._filtered)
+            self._filtered = bytearray()
+        else:
+            response = bytes(self._filtered[:n])
+            del self._filtered[:n]
         return response
 
+    def _filter(self, block):
+        """Append the characters of *block* outside of DTDs to the filtered characters."""
+        start = 0
+        self._tail = b""
+        while start < len(block):
+            if self._in_dtd:
+                end = block.find(b">", start)
+                if end == -1:
+                    return
+                self._in_dtd = False
+                start = end + 1
+            else:
+                end = block.find(b"<?", start)
+                if end == -1:
+                    if block.endswith(b"<"):
+                        self._filtered += block[start:-1]
+                        self._tail = b"<"
+                    else:
+                        self._filtered += block[start:]
+                    return
+                self._filtered += block[start:end]
+                self._in_dtd = True
+                start = end + 2
+
 class ResultsReader(object):
     """This class returns dictionaries and Splunk messages from an XML results
     stream.
@@ -291,5 +323,151 @@ class ResultsReader(object):
                 raise
 
 
+class JSONResultsReader(object):
+    """This class returns dictionaries and Splunk messages from a JSON results
+    stream.
+
+    ``JSONResultsReader`` is the counterpart of :class:`ResultsReader` for
+    results requested with ``output_mode=json`` or ``output_mode=json_rows``,
+    from the results endpoints as well as the export endpoint. It returns the
+    same objects: an ``OrderedDict`` for each result, with a ``list`` for
+    each multivalue field, or a :class:`Message` object for each Splunk
+    message. The ``is_preview`` field tells whether the most recent results
+    are a preview from a running search.
+
+    The ``results`` or ``rows`` array of a response is read one result at a
+    time, so arbitrarily large result sets are streamed rather than loaded.
+
+    :param `stream`: The stream to read from (any object that supports
+        ``.read()``).
 
+    **Example**::
 
+        import results
+        response = ... # the body of an HTTP response with output_mode=json
+        reader = results.JSONResultsReader(response)
+        for result in reader:
+            if isinstance(result, dict):
+                print "Result: %s" % result
+            elif isinstance(result, results.Message):
+                print "Message: %s" % result
+        print "is_preview = %s " % reader.is_preview
+    """
+    read_size = 64 * 1024
+
+    def __init__(self, stream):
+        self.is_preview = None
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder(object_pairs_hook=OrderedDict)
+        self._buffer = u""
+        self._position = 0
+        self._eof = False
+        self._gen = self._parse_results()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return next(self._gen)
+
+    __next__ = next
+
+    def _parse_results(self):
+        """Parse results and messages out of the stream.
+
+        The export endpoint streams a sequence of JSON objects, each holding
+        one ``result``, whereas the results endpoints return one object
+        holding a ``results`` array of objects, or a ``rows`` array of lists
+        when ``output_mode`` is ``json_rows``.
+        """
+        while self._peek() != u"":
+            self._consume(u"{")
+            fields = None
+            if self._peek() == u"}":
+                self._position += 1
+                continue
+            while True:
+                key = self._decode()
+                self._consume(u":")
+                if key in (u"results", u"rows") and self._peek() == u"[":
+                    # Results are decoded one at a time as they arrive
+                    self._position += 1
+                    if self._peek() == u"]":
+                        self._position += 1
+                    else:
+                        while True:
+                            yield self._result(self._decode(), fields)
+                            if self._consume(u",]") == u"]":
+                                break
+                else:
+                    value = self._decode()
+                    if key == u"preview":
+                        self.is_preview = value
+                    elif key == u"fields":
+                        fields = [field["name"] if isinstance(field, dict) else field for field in value]
+                    elif key == u"result":
+                        yield self._result(value, fields)
+                    elif key == u"messages":
+                        for message in value:
+                            yield Message(message["type"], message["text"])
+                if self._consume(u",}") == u"}":
+                    break
+
+    @staticmethod
+    def _result(value, fields):
+        if isinstance(value, list):
+            # A json_rows row holds the values in the order of fields, with
+            # null in place of a field the result doesn't have
+            if fields is None:
+                raise ValueError("JSON results hold rows without the fields they refer to preceding them")
+            return OrderedDict((name, v) for name, v in zip(fields, value) if v is not None)
+        return value
+
+    def _fill(self, size):
+        """Appends up to *size* more characters to the buffer; returns ``False`` at the end of the stream."""
+        if self._eof:
+            return False
+        data = self._stream.read(size)
+        self._eof = len(data) == 0
+        self._buffer = self._buffer[self._position:] + self._decoder.decode(data, self._eof)
+        self._position = 0
+        return not self._eof
+
+    def _peek(self):
+        """Skips whitespace and returns the next character, or an empty string at the end of the stream."""
+        while True:
+            self._position = _whitespace.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill(self.read_size):
+                return u""
+
+    def _consume(self, expected):
+        """Consumes the next character, which must be one of *expected*, and returns it."""
+        c = self._peek()
+        if c == u"" or c not in expected:
+            raise ValueError("Expected one of %r in JSON results but found %r" % (expected, c))
+        self._position += 1
+        return c
+
+    def _decode(self):
+        """Decodes the next JSON value, reading more of the stream until it is complete."""
+        self._peek()
+        size = self.read_size
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._position)
+            except ValueError:
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            if end == len(self._buffer) and self._fill(size):
+                # The value may go on in the stream, like a number cut short
+                continue
+            self._position = end
+            return value
+
+
+_whitespace = re.compile(r'[ \t\n\r]*')
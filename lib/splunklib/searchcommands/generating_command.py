@@ -211,6 +211,8 @@ class GeneratingCommand(SearchCommand):
         self.finish()
 
     def _execute_chunk_v2(self, process, chunk):
+        # Generating commands send unfinished chunks of maxresultrows records on their own
+        self._record_writer.continuation = None
         count = 0
         for row in process:
             self._record_writer.write_record(row)
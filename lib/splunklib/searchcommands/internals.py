@@ -16,7 +16,7 @@
 
 from __future__ import absolute_import, division, print_function
 
-from io import TextIOWrapper
+from io import RawIOBase, TextIOWrapper
 from collections import deque, namedtuple
 from splunklib import six
 try:
@@ -24,11 +24,17 @@ try:
 except ImportError:
     from ..ordereddict import OrderedDict
 from splunklib.six.moves import StringIO
-from itertools import chain
-from splunklib.six.moves import map as imap
+from itertools import chain, islice, repeat
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping  # python 2
+from splunklib.six.moves import filter as ifilter, map as imap, zip as izip
 from json import JSONDecoder, JSONEncoder
 from json.encoder import encode_basestring_ascii as json_encode_string
 from splunklib.six.moves import urllib
+from splunklib.six.moves.queue import Queue
+from threading import Thread
 
 import csv
 import gzip
@@ -38,6 +44,7 @@ import sys
 import warnings
 
 from . import environment
+from .multivalue import encode_multivalue
 
 csv.field_size_limit(10485760)  # The default value is 128KB; upping to 10MB. See SPL-12117 for background on this issue
 
@@ -74,6 +81,61 @@ def set_binary_mode(fh):
     return fh
 
 
+class ChunkBuffer(object):
+    """ Reusable buffer for the bodies of chunks.
+
+    Bodies are read into the buffer with :code:`readinto` and returned as :class:`memoryview` instances. The buffer is
+    only reallocated, if a body does not fit into it.
+
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def read(self, istream, size):
+        if size > len(self._buffer):
+            # Views on the current buffer may still be alive, so we replace it rather than resizing it
+            self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+
+        view = memoryview(self._buffer)[:size]
+        readinto = getattr(istream, 'readinto', None)
+        count = 0
+
+        while count < size:
+            if readinto is None:
+                data = istream.read(size - count)
+                n = len(data)
+                view[count:count + n] = data
+            else:
+                n = readinto(view[count:])
+            if not n:
+                raise IOError('Unexpected end of input after {} bytes'.format(count))
+            count += n
+
+        return view
+
+
+class MemoryViewReader(RawIOBase):
+    """ Raw binary stream over a :class:`memoryview`.
+
+    Wrap it in a :class:`TextIOWrapper` to decode the view incrementally, rather than decoding it as a whole.
+
+    """
+    def __init__(self, view):
+        RawIOBase.__init__(self)
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        view = self._view[self._position:self._position + len(b)]
+        n = len(view)
+        b[:n] = view
+        self._position += n
+        return n
+
+
 class CommandLineParser(object):
     r""" Parses the arguments to a search command.
 
@@ -353,6 +415,86 @@ class ConfigurationSettingsType(type):
             supporting_protocols=[2])}
 
 
+class CompactRecord(MutableMapping):
+    """ Dict-like record backed by a list of values and a schema shared by all records of a chunk.
+
+    The schema is a tuple of the fieldnames and a dictionary mapping each fieldname to the index of its value. Fields
+    added to a record that are not in the schema are kept in a separate :class:`OrderedDict`. Iteration order is schema
+    order followed by the order in which other fields were added.
+
+    """
+    __slots__ = ('_schema', '_values', '_extra')
+
+    missing = object()  # marks a field without a value
+
+    def __init__(self, schema, values):
+        self._schema = schema
+        self._values = values
+        self._extra = None
+
+    def __contains__(self, key):
+        index = self._schema[1].get(key)
+        if index is None:
+            return self._extra is not None and key in self._extra
+        return self._values[index] is not _missing
+
+    def __delitem__(self, key):
+        index = self._schema[1].get(key)
+        if index is None:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+        elif self._values[index] is _missing:
+            raise KeyError(key)
+        else:
+            self._values[index] = _missing
+
+    def __getitem__(self, key):
+        index = self._schema[1].get(key)
+        if index is None:
+            if self._extra is None:
+                raise KeyError(key)
+            return self._extra[key]
+        value = self._values[index]
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for name, value in zip(self._schema[0], self._values):
+            if value is not _missing:
+                yield name
+        if self._extra is not None:
+            for name in self._extra:
+                yield name
+
+    def __len__(self):
+        count = len(self._values) - self._values.count(_missing)
+        return count if self._extra is None else count + len(self._extra)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(six.iteritems(self)))
+
+    def __setitem__(self, key, value):
+        index = self._schema[1].get(key)
+        if index is None:
+            if self._extra is None:
+                self._extra = OrderedDict()
+            self._extra[key] = value
+        else:
+            self._values[index] = value
+
+    def get(self, key, default=None):
+        index = self._schema[1].get(key)
+        if index is None:
+            return default if self._extra is None else self._extra.get(key, default)
+        value = self._values[index]
+        return default if value is _missing else value
+
+
+_missing = CompactRecord.missing
+
+
 class CsvDialect(csv.Dialect):
     """ Describes the properties of Splunk CSV streams """
     delimiter = ','
@@ -452,6 +594,252 @@ class ObjectView(object):
         return str(self.__dict__)
 
 
+class SearchResultsInfo(ObjectView):
+    """ Search results info read from the :code:`info.csv` file of a dispatch directory.
+
+    Field names are converted as they are read: a leading underscore is dropped and dots are replaced by underscores.
+    Values are decoded on first access. The :code:`info.csv` file of a busy search is large and most commands look at
+    a handful of its fields at most.
+
+    """
+    __slots__ = ('_fields',)
+
+    def __init__(self, fields, values):
+        ObjectView.__init__(self, {})
+        self._fields = raw = OrderedDict(
+            ((field[1:] if field[0] == '_' else field).replace('.', '_'), value) for field, value in izip(fields, values))
+
+        # The msg field is decoded together with msgType, which is not exposed by itself
+        if 'msg' in raw and 'msgType' in raw:
+            raw['msg'] = (raw.pop('msgType'), raw['msg'])
+
+    def __getattr__(self, name):
+        if name == '_fields':
+            raise AttributeError(name)
+        try:
+            value = self._fields.pop(name)
+        except KeyError:
+            raise AttributeError(name)
+        value = self.__dict__[name] = self._decode(name, value)
+        return value
+
+    def __repr__(self):
+        self._decode_all()
+        return ObjectView.__repr__(self)
+
+    def __str__(self):
+        self._decode_all()
+        return ObjectView.__str__(self)
+
+    def _decode_all(self):
+        for name in list(self._fields):
+            getattr(self, name)
+
+    @staticmethod
+    def _decode(name, value):
+        if name == 'msg' and isinstance(value, tuple):
+            msg_type, msg_text = (SearchResultsInfo._decode_value(value) for value in value)
+            messages = ifilter(lambda t_m: t_m[0] or t_m[1], izip(msg_type.split('\n'), msg_text.split('\n')))
+            return [Message(*message) for message in messages]
+
+        value = SearchResultsInfo._decode_value(value)
+
+        if name == 'countMap':
+            count_map = value.split(';')
+            n = len(count_map)
+            return dict(izip(islice(count_map, 0, n, 2), islice(count_map, 1, n, 2)))
+
+        if name == 'vix_families':
+            from xml.etree import ElementTree
+            return ElementTree.fromstring(value)
+
+        return value
+
+    @staticmethod
+    def _decode_value(value):
+        try:
+            return SearchResultsInfo._decoder.decode(value) if len(value) > 0 else value
+        except ValueError:
+            return value
+
+    _decoder = MetadataDecoder()
+
+
+class PipelinedChunkReader(object):
+    """ Reads and decodes chunks on a background thread.
+
+    Records are decoded in batches and handed over through a bounded queue, so that the next batch of records is
+    decoded while the current one is processed. Reading stops after the final chunk of input, which is reported as end
+    of input.
+
+    """
+    def __init__(self, istream, read_chunk, read_records, as_text_stream=StringIO, batch_size=1000, depth=2):
+        self._istream = istream
+        self._read_chunk = read_chunk
+        self._read_records = read_records
+        self._as_text_stream = as_text_stream
+        self._batch_size = batch_size
+        self._queue = Queue(maxsize=depth)
+        self._pending = False  # True, if the records of the current chunk have not been consumed completely
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def read_chunk(self):
+        """ Returns the metadata of the next chunk and an iterator over its records or :const:`None` at end of input.
+
+        The iterator is :const:`None`, if the chunk has no body.
+
+        """
+        if self._pending:
+            for _ in self._records():
+                pass
+
+        kind, value = self._get()
+
+        if kind == 'eof':
+            return None
+
+        metadata, has_body = value
+
+        if not has_body:
+            self._get()  # end of chunk
+            return metadata, None
+
+        self._pending = True
+        return metadata, self._records()
+
+    def _get(self):
+        kind, value = self._queue.get()
+        if kind == 'error':
+            six.reraise(*value)
+        return kind, value
+
+    def _records(self):
+        while self._pending:
+            kind, value = self._get()
+            if kind == 'end':
+                self._pending = False
+                return
+            for record in value:
+                yield record
+
+    def _run(self):
+        put = self._queue.put
+        batch_size = self._batch_size
+
+        # noinspection PyBroadException
+        try:
+            while True:
+                result = self._read_chunk(self._istream)
+
+                if not result:
+                    put(('eof', None))
+                    return
+
+                metadata, body = result
+                put(('chunk', (metadata, len(body) > 0)))
+
+                if len(body) > 0:
+                    batch = []
+                    for record in self._read_records(self._as_text_stream(body)):
+                        batch.append(record)
+                        if len(batch) == batch_size:
+                            put(('records', batch))
+                            batch = []
+                    if batch:
+                        put(('records', batch))
+
+                put(('end', None))
+
+                if getattr(metadata, 'finished', False):
+                    # Splunkd has sent all of its input. What follows are requests for more output, which the caller
+                    # reads on its own.
+                    put(('eof', None))
+                    return
+        except:
+            put(('error', sys.exc_info()))
+
+
+class PipelinedRecordWriter(object):
+    """ Serializes records on a background thread.
+
+    Records are handed over to the wrapped :class:`RecordWriter` in batches through a bounded queue, so that the next
+    batch of records is computed while the current one is serialized. The background thread owns the wrapped record
+    writer until :meth:`drain` returns. Anything else that changes it in the meantime, like messages and metrics, must
+    go through :meth:`call`.
+
+    """
+    def __init__(self, record_writer, batch_size=1000, depth=2):
+        self._record_writer = record_writer
+        self._batch_size = batch_size
+        self._batch = []
+        self._error = None
+        self._queue = Queue(maxsize=depth)
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def call(self, name, *args):
+        """ Calls method :code:`name` of the wrapped :class:`RecordWriter` on the background thread.
+
+        The call happens after all records written so far.
+
+        """
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+        method = getattr(self._record_writer, name)
+        self._queue.put(lambda: method(*args))
+
+    def close(self):
+        """ Stops the background thread after it has written all queued records.
+
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def drain(self):
+        """ Waits until all records have been written to the wrapped :class:`RecordWriter`.
+
+        """
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+        self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            six.reraise(*error)
+
+    def write_records(self, records):
+        # N.B.: drain and call may be called while records are produced, hence we must not hold on to self._batch
+        for record in records:
+            self._batch.append(record)
+            if len(self._batch) == self._batch_size:
+                self._queue.put(self._batch)
+                self._batch = []
+
+    def _run(self):
+        # Partial flushes on reaching maxresultrows or the maximum buffer size happen on this thread as well. Sending
+        # an unfinished chunk means reading the next request. That is safe here, because PipelinedChunkReader stops
+        # reading after the final chunk of input and the processing thread reads input only after drain returns.
+        write_records = self._record_writer.write_records
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    if callable(item):
+                        item()
+                    else:
+                        write_records(item)
+            except:
+                self._error = sys.exc_info()
+            finally:
+                self._queue.task_done()
+
+
 class Recorder(object):
 
     def __init__(self, path, f):
@@ -473,6 +861,13 @@ class Recorder(object):
         self._recording.flush()
         return value
 
+    def readinto(self, b):
+        n = self._file.readinto(b)
+        if n:
+            self._recording.write(memoryview(b)[:n])
+            self._recording.flush()
+        return n
+
     def readline(self, size=None):
         value = self._file.readline() if size is None else self._file.readline(size)
         if len(value) > 0:
@@ -482,7 +877,7 @@ class Recorder(object):
 
     def record(self, *args):
         for arg in args:
-            self._recording.write(arg)
+            self._recording.write(arg.encode('utf-8') if isinstance(arg, six.text_type) else arg)
 
     def write(self, text):
         self._recording.write(text)
@@ -492,8 +887,12 @@ class Recorder(object):
 
 class RecordWriter(object):
 
-    def __init__(self, ofile, maxresultrows=None):
+    def __init__(self, ofile, maxresultrows=None, max_buffer_size=None):
         self._maxresultrows = 50000 if maxresultrows is None else maxresultrows
+        self._max_buffer_size = max_buffer_size
+        self._buffer_high_water_mark = 0
+        self._buffer_size = 0  # number of bytes the output buffer takes up once encoded
+        self._rows_size = 0  # estimated number of bytes the rows not yet in the output buffer take up
 
         self._ofile = set_binary_mode(ofile)
         self._fieldnames = None
@@ -501,6 +900,9 @@ class RecordWriter(object):
 
         self._writer = csv.writer(self._buffer, dialect=CsvDialect)
         self._writerow = self._writer.writerow
+        self._rows = []
+        self._serialize = None
+        self._serializers = {}
         self._finished = False
         self._flushed = False
 
@@ -509,6 +911,16 @@ class RecordWriter(object):
         self._pending_record_count = 0
         self._committed_record_count = 0
 
+    @property
+    def buffer_high_water_mark(self):
+        """ Returns the largest size of the output buffer in bytes seen so far.
+
+        Records not yet serialized are serialized first, so that they are accounted for.
+
+        """
+        self._write_rows()
+        return max(self._buffer_high_water_mark, self._buffer_size)
+
     @property
     def is_flushed(self):
         return self._flushed
@@ -570,6 +982,59 @@ class RecordWriter(object):
         self._ensure_validity()
         self._write_record(record)
 
+    def write_columns(self, columns):
+        """ Writes records given as a mapping from fieldname to a list of values.
+
+        All lists must be of the same length. Nothing is written, if :code:`columns` is :const:`None` or holds no
+        records.
+
+        """
+        self._ensure_validity()
+
+        if not columns:
+            return
+
+        count = len(next(iter(columns.values())))
+
+        if any(len(column) != count for column in columns.values()):
+            raise ValueError('All columns must be of the same length')
+
+        if count == 0:
+            return
+
+        fieldnames = self._fieldnames
+
+        if fieldnames is None:
+            self._fieldnames = fieldnames = list(columns.keys())
+            value_list = imap(lambda fn: (str(fn), str('__mv_') + str(fn)), fieldnames)
+            self._rows.append(list(chain.from_iterable(value_list)))
+            self._serialize = self._get_serializer(fieldnames)
+
+        plain_types = self._plain_types
+        scalar_encoders = self._scalar_encoders
+        encode_value = self._encode_value
+        pairs = []
+
+        for fieldname in fieldnames:
+            column = columns.get(fieldname)
+            if column is None:
+                pairs += (repeat(None, count), repeat(None, count))
+                continue
+            column_types = set(imap(type, column))
+            if plain_types.issuperset(column_types):
+                pairs += (column, repeat(None, count))
+            elif len(column_types) == 1 and next(iter(column_types)) in scalar_encoders:
+                pairs += (imap(scalar_encoders[next(iter(column_types))], column), repeat(None, count))
+            else:
+                pairs += zip(*imap(encode_value, column))
+
+        self._rows.extend(izip(*pairs))
+        self._pending_record_count += count
+        self._write_rows()
+
+        if self.pending_record_count >= self._maxresultrows or self._is_buffer_full():
+            self.flush(partial=True)
+
     def write_records(self, records):
         self._ensure_validity()
         write_record = self._write_record
@@ -577,8 +1042,12 @@ class RecordWriter(object):
             write_record(record)
 
     def _clear(self):
+        self._rows = []
+        self._rows_size = 0
+        self._buffer_high_water_mark = self.buffer_high_water_mark
         self._buffer.seek(0)
         self._buffer.truncate()
+        self._buffer_size = 0
         self._inspector.clear()
         self._pending_record_count = 0
 
@@ -594,37 +1063,125 @@ class RecordWriter(object):
         if fieldnames is None:
             self._fieldnames = fieldnames = list(record.keys())
             value_list = imap(lambda fn: (str(fn), str('__mv_') + str(fn)), fieldnames)
-            self._writerow(list(chain.from_iterable(value_list)))
+            self._rows.append(list(chain.from_iterable(value_list)))
+            self._serialize = self._get_serializer(fieldnames)
 
-        get_value = record.get
-        values = []
+        row = self._serialize(record)
+        self._rows.append(row)
+        self._pending_record_count += 1
 
-        for fieldname in fieldnames:
-            value = get_value(fieldname, None)
+        if self._max_buffer_size is not None:
+            # The estimate counts characters plus a separator per value, the buffer is measured once it might be full
+            self._rows_size += sum(len(value) for value in row if value is not None) + len(row)
+            if self._buffer_size + self._rows_size >= self._max_buffer_size and self._is_buffer_full():
+                self.flush(partial=True)
+                return
 
-            if value is None:
-                values += (None, None)
-                continue
+        if len(self._rows) >= self._batch_size:
+            self._write_rows()
 
-            value_t = type(value)
+        if self.pending_record_count >= self._maxresultrows:
+            self.flush(partial=True)
+
+    def _is_buffer_full(self):
+        if self._max_buffer_size is None:
+            return False
+        self._write_rows()
+        return self._buffer_size >= self._max_buffer_size
+
+    def _write_rows(self):
+        if self._rows:
+            buffer = self._buffer
+            start = buffer.tell()
+            self._writer.writerows(self._rows)
+            self._rows = []
+            self._rows_size = 0
+            buffer.seek(start)
+            self._buffer_size += self._encoded_length(buffer.read())
+
+    @staticmethod
+    def _encoded_length(text):
+        """ Returns the length of :code:`text` in bytes once it is encoded as UTF-8 for output.
+
+        """
+        if isinstance(text, bytes):
+            return len(text)
+        try:
+            if text.isascii():
+                return len(text)
+        except AttributeError:  # Python < 3.7
+            pass
+        return len(text.encode('utf-8'))
+
+    def _get_serializer(self, fieldnames):
+        key = tuple(fieldnames)
+        try:
+            return self._serializers[key]
+        except KeyError:
+            serialize = self._serializers[key] = self._compile_serializer(fieldnames)
+            return serialize
+
+    @staticmethod
+    def _compile_serializer(fieldnames):
+        """ Returns a function that converts a record with the given fieldnames to a row of value pairs.
+
+        Records consisting of strings and :const:`None` values take a fast path that needs no per-value dispatch.
+        Otherwise values of the common scalar types are converted by a lookup of their type and only the remaining
+        ones by :meth:`_encode_value`.
+
+        """
+        fieldnames = list(fieldnames)
+        width = 2 * len(fieldnames)
+        plain_types = RecordWriter._plain_types
+        scalar_encoders = RecordWriter._scalar_encoders
+        encode_value = RecordWriter._encode_value
+
+        def serialize(record):
+            values = list(imap(record.get, fieldnames))
+            row = [None] * width
+            if plain_types.issuperset(imap(type, values)):
+                row[::2] = values
+                return row
+            index = 0
+            for value in values:
+                value_t = type(value)
+                if value_t in plain_types:
+                    row[index] = value
+                else:
+                    encode_scalar = scalar_encoders.get(value_t)
+                    if encode_scalar is None:
+                        row[index], row[index + 1] = encode_value(value)
+                    else:
+                        row[index] = encode_scalar(value)
+                index += 2
+            return row
+
+        return serialize
+
+    @staticmethod
+    def _encode_value(value):
+        """ Converts a field value to a pair of its single value and its encoded multivalue.
+
+        """
+        if value is None:
+            return None, None
+
+        value_t = type(value)
 
-            if issubclass(value_t, (list, tuple)):
+        if issubclass(value_t, (list, tuple)):
 
-                if len(value) == 0:
-                    values += (None, None)
-                    continue
+            if len(value) == 0:
+                return None, None
 
-                if len(value) > 1:
-                    value_list = value
-                    sv = ''
-                    mv = '$'
+            if len(value) > 1:
+                if RecordWriter._plain_types.issuperset(imap(type, value)):
+                    return encode_multivalue(value)
 
-                    for value in value_list:
+                value_list = []
 
-                        if value is None:
-                            sv += '\n'
-                            mv += '$;$'
-                            continue
+                for value in value:
+
+                    if value is not None:
 
                         value_t = type(value)
 
@@ -641,44 +1198,40 @@ class RecordWriter(object):
                             else:
                                 value = repr(value).encode('utf-8', errors='backslashreplace')
 
-                        sv += value + '\n'
-                        mv += value.replace('$', '$$') + '$;$'
+                    value_list.append(value)
 
-                    values += (sv[:-1], mv[:-2])
-                    continue
+                return encode_multivalue(value_list)
 
-                value = value[0]
-                value_t = type(value)
+            value = value[0]
+            value_t = type(value)
 
-            if value_t is bool:
-                values += (str(value.real), None)
-                continue
+        if value_t is bool:
+            return str(value.real), None
 
-            if value_t is bytes:
-                values += (value, None)
-                continue
+        if value_t is bytes:
+            return value, None
 
-            if value_t is six.text_type:
-                if six.PY2:
-                    value = value.encode('utf-8')
-                values += (value, None)
-                continue
+        if value_t is six.text_type:
+            if six.PY2:
+                value = value.encode('utf-8')
+            return value, None
 
-            if isinstance(value, six.integer_types) or value_t is float or value_t is complex:
-                values += (str(value), None)
-                continue
+        if isinstance(value, six.integer_types) or value_t is float or value_t is complex:
+            return str(value), None
 
-            if issubclass(value_t, dict):
-                values += (str(''.join(RecordWriter._iterencode_json(value, 0))), None)
-                continue
+        if issubclass(value_t, dict):
+            return str(''.join(RecordWriter._iterencode_json(value, 0))), None
 
-            values += (repr(value), None)
+        return repr(value), None
 
-        self._writerow(values)
-        self._pending_record_count += 1
+    _batch_size = 1000  # number of rows passed to csv.writer.writerows at once
 
-        if self.pending_record_count >= self._maxresultrows:
-            self.flush(partial=True)
+    _plain_types = frozenset((str, type(None)))  # types written as they are
+
+    # Converts values of the common scalar types to their single value like _encode_value does
+    _scalar_encoders = dict(
+        [(bool, lambda value: str(value.real)), (float, str), (complex, str), (bytes, lambda value: value)] +
+        [(integer_type, str) for integer_type in six.integer_types])
 
     try:
         # noinspection PyUnresolvedReferences
@@ -751,6 +1304,7 @@ class RecordWriterV1(RecordWriter):
                 for level, text in messages:
                     print(level, text, file=stderr)
 
+            self._write_rows()
             self.write(self._buffer.getvalue())
             self._chunk_count += 1
             self._committed_record_count += self.pending_record_count
@@ -769,13 +1323,32 @@ class RecordWriterV1(RecordWriter):
 
 class RecordWriterV2(RecordWriter):
 
+    def __init__(self, ofile, maxresultrows=None, max_buffer_size=None):
+        RecordWriter.__init__(self, ofile, maxresultrows, max_buffer_size)
+        self._continuation = None
+
+    @property
+    def continuation(self):
+        """ Returns the function that reads the request splunkd sends in response to an unfinished chunk or :const:`None`.
+
+        """
+        return self._continuation
+
+    @continuation.setter
+    def continuation(self, value):
+        self._continuation = value
+
     def flush(self, finished=None, partial=None):
 
         RecordWriter.flush(self, finished, partial)  # validates arguments and the state of this instance
 
-        if partial or not finished:
-            # Don't flush partial chunks, since the SCP v2 protocol does not
-            # provide a way to send partial chunks yet.
+        if partial or finished is False:
+            # The SCP v2 protocol does not provide a way to send partial chunks yet. However, once splunkd has sent
+            # all of its input, it keeps sending empty requests until we report that we are finished. This lets us
+            # send the records written so far as an unfinished chunk.
+            if self._continuation is not None and self.pending_record_count > 0:
+                self.write_chunk(finished=False)
+                self._continuation()
             return
 
         if not self.is_flushed:
@@ -796,10 +1369,14 @@ class RecordWriterV2(RecordWriter):
         # if partial is True:
         #     finished = False
 
+        if finished and self._max_buffer_size is not None:
+            inspector['metric.output_buffer_high_water_mark'] = self.buffer_high_water_mark
+
         if len(inspector) == 0:
             inspector = None
 
         metadata = [item for item in (('inspector', inspector), ('finished', finished))]
+        self._write_rows()
         self._write_chunk(metadata, self._buffer.getvalue())
         self._clear()
 
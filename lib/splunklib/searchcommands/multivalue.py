@@ -0,0 +1,74 @@
+# coding=utf-8
+#
+# Copyright © 2011-2015 Splunk, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"): you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Codec for the :code:`__mv_` multivalue field encoding used by the search command protocols.
+
+A multivalue field is transmitted as a pair of fields. The field itself holds the values joined by newlines. The
+companion :code:`__mv_<fieldname>` field holds each value wrapped in :code:`$` and separated by :code:`;`, with every
+:code:`$` in a value doubled. The list :code:`['a', 'b$c']`, for example, is encoded as :code:`$a$;$b$$c$`.
+
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import re
+
+
+def encode_multivalue(values):
+    """ Encodes a list of strings as a pair of its single value and its :code:`__mv_` value.
+
+    Items equal to :const:`None` are encoded as empty strings.
+
+    :param values: Values to encode.
+    :type values: list or tuple
+
+    :return: Single value and multivalue.
+    :rtype: tuple
+
+    """
+    if None in values:
+        values = ['' if value is None else value for value in values]
+    sv = '\n'.join(values)
+    # Without dollar signs in the values there is nothing to escape
+    if '$' not in sv:
+        return sv, '$' + '$;$'.join(values) + '$'
+    return sv, '$' + '$;$'.join([value.replace('$', '$$') for value in values]) + '$'
+
+
+def decode_multivalue(mv):
+    """ Decodes an :code:`__mv_` value into the list of values it holds.
+
+    Malformed input, which :func:`encode_multivalue` never produces, may decode differently than it did before this
+    codec existed. A lone :code:`$` inside a value is now kept as part of it, :code:`'$a$a$'` for example decodes as
+    :code:`['a$a']` rather than :code:`['a']`.
+
+    :param mv: Encoded multivalue.
+    :type mv: str
+
+    :return: Decoded values.
+    :rtype: list
+
+    """
+    # Without escaped dollar signs the separators are unambiguous and a split does the job
+    if '$$' not in mv and len(mv) >= 2 and mv[0] == '$' and mv[-1] == '$':
+        return mv[1:-1].split('$;$')
+    return [item.replace('$$', '$') for item in _encoded_item.findall(mv)]
+
+
+_encoded_item = re.compile(r'\$((?:\$\$|[^$])*)\$(?:;|$)')  # matches a single value in an encoded list
+
+
+__all__ = ['decode_multivalue', 'encode_multivalue']
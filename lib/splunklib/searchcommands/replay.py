@@ -0,0 +1,360 @@
+# coding=utf-8
+#
+# Copyright © 2011-2015 Splunk, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"): you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Replays recorded search command protocol (v2) sessions against a search command class.
+
+Run a command with :code:`record=true` to record a session. The recording is written to
+:code:`$SPLUNK_HOME/var/run/splunklib.searchcommands/recordings` as a set of files sharing a common prefix:
+:code:`<prefix>.input.gz`, :code:`<prefix>.output.gz` and, for searches with a dispatch directory,
+:code:`<prefix>.dispatch_dir.tar.gz`. Pass that prefix to :func:`replay` or on the command line::
+
+    python -m splunklib.searchcommands.replay bin/checkappcompatibility.py:CheckAppCompatibilityCommand <prefix>
+
+The replay reports the latency and record counts of every chunk, the overall throughput, the peak memory allocated by
+Python and the differences between the recorded output and the output of the replay.
+
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from collections import namedtuple
+from io import BytesIO
+from json import dumps, loads
+
+import csv
+import io
+import os
+import re
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zlib
+
+from splunklib import six
+
+from .internals import CsvDialect
+
+
+Chunk = namedtuple('Chunk', ('metadata', 'body'))
+
+ChunkStatistics = namedtuple('ChunkStatistics', ('index', 'action', 'input_records', 'output_records', 'latency'))
+
+
+class ReplayReport(object):
+    """ Outcome of a replay as returned by :func:`replay`.
+
+    :ivar chunks: Statistics of every input chunk.
+    :ivar elapsed: Seconds spent processing the recorded input.
+    :ivar peak_memory: Peak number of bytes allocated by Python or :const:`None`, if memory was not traced.
+    :ivar exit_status: Exit status of the command or :const:`None`, if it returned normally.
+    :ivar differences: List of :code:`(chunk index, description)` pairs describing how the output of the replay
+        differs from the recorded output.
+
+    """
+    def __init__(self, chunks, elapsed, peak_memory, exit_status, differences):
+        self.chunks = chunks
+        self.elapsed = elapsed
+        self.peak_memory = peak_memory
+        self.exit_status = exit_status
+        self.differences = differences
+
+    @property
+    def input_records(self):
+        return sum(chunk.input_records for chunk in self.chunks)
+
+    @property
+    def output_records(self):
+        return sum(chunk.output_records for chunk in self.chunks)
+
+    @property
+    def throughput(self):
+        """ Input records processed per second.
+
+        """
+        return self.input_records / self.elapsed if self.elapsed > 0 else float('inf')
+
+    def __str__(self):
+        lines = ['chunk  action      input   output  latency (ms)']
+        for chunk in self.chunks:
+            lines.append('{0:5d}  {1:<9} {2:7d}  {3:7d}  {4:12.3f}'.format(
+                chunk.index, chunk.action or '', chunk.input_records, chunk.output_records, chunk.latency * 1000.0))
+        lines.append('')
+        lines.append('elapsed: {0:.3f} s, throughput: {1:.0f} records/s'.format(self.elapsed, self.throughput))
+        if self.peak_memory is not None:
+            lines.append('peak memory: {0:.1f} MiB'.format(self.peak_memory / 1048576.0))
+        if self.exit_status is not None:
+            lines.append('exit status: {0}'.format(self.exit_status))
+        if self.differences:
+            lines.append('{0} difference(s) from the recorded output:'.format(len(self.differences)))
+            lines.extend('  chunk {0}: {1}'.format(index, description) for index, description in self.differences)
+        else:
+            lines.append('output matches the recording')
+        return '\n'.join(lines)
+
+
+def replay(command_class, recording, trace_memory=False, ignored_metadata=('inspector',)):
+    """ Replays a recorded session against :code:`command_class` and compares its output with the recorded output.
+
+    :param command_class: Search command class to instantiate and execute.
+    :type command_class: type
+
+    :param recording: Path of the recording without the :code:`.input.gz` suffix.
+    :type recording: str
+
+    :param trace_memory: :const:`True`, if the peak memory allocated by Python should be measured. This slows the
+        replay down.
+    :type trace_memory: bool
+
+    :param ignored_metadata: Metadata keys that are expected to differ between runs and are not compared.
+    :type ignored_metadata: tuple
+
+    :return: Statistics and differences.
+    :rtype: ReplayReport
+
+    """
+    input_chunks = parse_chunks(_read_recording(recording + '.input.gz'))
+    output_path = recording + '.output.gz'
+
+    if os.path.exists(output_path):
+        recorded_output = parse_chunks(_read_recording(output_path))
+    else:
+        recorded_output = None
+
+    dispatch_dir = None
+    archive = recording + '.dispatch_dir.tar.gz'
+
+    if os.path.exists(archive):
+        dispatch_dir = tempfile.mkdtemp(prefix='replay-')
+        with tarfile.open(archive) as tar:
+            base_dir = tar.getnames()[0].split('/')[0]
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(dispatch_dir, filter='data')
+            else:
+                tar.extractall(dispatch_dir)
+        _set_dispatch_dir(input_chunks[0], os.path.join(dispatch_dir, base_dir))
+
+    ifile = _InstrumentedInput(input_chunks)
+    ofile = BytesIO()
+    exit_status = None
+    tempdir = tempfile.tempdir  # the command points it to its dispatch directory
+
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+
+    start = _clock()
+
+    try:
+        command_class().process([command_class.__name__], ifile, ofile)
+    except SystemExit as error:
+        exit_status = error.code
+    finally:
+        stop = _clock()
+        tempfile.tempdir = tempdir
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            peak_memory = None
+        if dispatch_dir is not None:
+            shutil.rmtree(dispatch_dir, ignore_errors=True)
+
+    output_chunks = parse_chunks(ofile.getvalue())
+    marks = ifile.marks + [stop] * (len(input_chunks) + 1 - len(ifile.marks))
+    chunks = [
+        ChunkStatistics(
+            index,
+            chunk.metadata.get('action'),
+            _count_records(chunk.body),
+            _count_records(output_chunks[index].body) if index < len(output_chunks) else 0,
+            marks[index + 1] - marks[index])
+        for index, chunk in enumerate(input_chunks)]
+
+    if recorded_output is None:
+        differences = [(None, 'no recorded output to compare with')]
+    else:
+        differences = diff_chunks(recorded_output, output_chunks, ignored_metadata)
+
+    return ReplayReport(chunks, stop - start, peak_memory, exit_status, differences)
+
+
+def parse_chunks(data):
+    """ Splits a recorded protocol v2 stream into a list of :class:`Chunk` objects.
+
+    Metadata is decoded from JSON; bodies are kept as bytes.
+
+    """
+    chunks = []
+    position = 0
+    length = len(data)
+
+    while position < length:
+        match = _header.match(data, position)
+        if match is None:
+            if data[position:position + 1] in (b'\n', b'\r'):  # write_metadata terminates chunks with a newline
+                position += 1
+                continue
+            raise ValueError('Expected a chunk header at offset {0}, not {1!r}'.format(
+                position, data[position:position + 32]))
+        metadata_length, body_length = int(match.group(1)), int(match.group(2))
+        position = match.end()
+        metadata = data[position:position + metadata_length]
+        position += metadata_length
+        body = data[position:position + body_length]
+        position += body_length
+        chunks.append(Chunk(loads(metadata.decode('utf-8')) if metadata_length > 0 else {}, body))
+
+    return chunks
+
+
+def diff_chunks(expected, actual, ignored_metadata=()):
+    """ Compares two lists of :class:`Chunk` objects and describes how they differ.
+
+    Bodies are compared record by record so that differences in line endings or quoting are not reported.
+
+    """
+    differences = []
+
+    if len(expected) != len(actual):
+        differences.append((None, 'expected {0} chunks, not {1}'.format(len(expected), len(actual))))
+
+    for index, (expected_chunk, actual_chunk) in enumerate(six.moves.zip(expected, actual)):
+        for key in sorted(set(expected_chunk.metadata) | set(actual_chunk.metadata)):
+            if key in ignored_metadata:
+                continue
+            expected_value, actual_value = expected_chunk.metadata.get(key), actual_chunk.metadata.get(key)
+            if expected_value != actual_value:
+                differences.append((index, 'metadata {0}: expected {1}, not {2}'.format(
+                    key, dumps(expected_value), dumps(actual_value))))
+
+        expected_rows, actual_rows = _read_rows(expected_chunk.body), _read_rows(actual_chunk.body)
+
+        if expected_rows[:1] != actual_rows[:1]:
+            differences.append((index, 'fields: expected {0}, not {1}'.format(expected_rows[:1], actual_rows[:1])))
+            continue
+
+        if len(expected_rows) != len(actual_rows):
+            differences.append((index, 'expected {0} records, not {1}'.format(
+                max(len(expected_rows) - 1, 0), max(len(actual_rows) - 1, 0))))
+
+        for record_index, (expected_row, actual_row) in enumerate(six.moves.zip(expected_rows[1:], actual_rows[1:])):
+            if expected_row != actual_row:
+                differences.append((index, 'record {0}: expected {1}, not {2}'.format(
+                    record_index, expected_row, actual_row)))
+                break  # one record is enough to point at the problem
+
+    return differences
+
+
+# region Helpers
+
+class _InstrumentedInput(BytesIO):
+    """ Serves recorded chunks and notes the time at which the command starts reading each of them.
+
+    Splunk waits for the response to a chunk before it sends the next one. Hence the time between starting to read
+    two consecutive chunks is the time the command spent on the first of them.
+
+    """
+    def __init__(self, chunks):
+        data = BytesIO()
+        self._offsets = []
+        for chunk in chunks:
+            self._offsets.append(data.tell())
+            metadata = dumps(chunk.metadata).encode('utf-8') if chunk.metadata else b''
+            data.write('chunked 1.0,{0},{1}\n'.format(len(metadata), len(chunk.body)).encode('ascii'))
+            data.write(metadata)
+            data.write(chunk.body)
+        BytesIO.__init__(self, data.getvalue())
+        self.marks = []
+
+    def _mark(self):
+        position = self.tell()
+        marks, offsets = self.marks, self._offsets
+        while len(marks) < len(offsets) and position >= offsets[len(marks)]:
+            marks.append(_clock())
+
+    def read(self, size=-1):
+        self._mark()
+        return BytesIO.read(self, size)
+
+    def readinto(self, b):
+        self._mark()
+        return BytesIO.readinto(self, b)
+
+    def readline(self, size=-1):
+        self._mark()
+        return BytesIO.readline(self, size)
+
+
+def _read_recording(path):
+    # Recorder flushes but never closes its file, so a recording usually lacks the gzip end-of-stream marker that
+    # gzip.open insists on
+    with open(path, 'rb') as f:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(f.read())
+
+
+def _set_dispatch_dir(chunk, dispatch_dir):
+    searchinfo = chunk.metadata.get('searchinfo')
+    if searchinfo is not None:
+        searchinfo['dispatch_dir'] = dispatch_dir
+
+
+def _read_rows(body):
+    if len(body) == 0:
+        return []
+    return list(csv.reader(io.StringIO(body.decode('utf-8'), newline=''), dialect=CsvDialect))
+
+
+def _count_records(body):
+    return max(len(_read_rows(body)) - 1, 0)
+
+
+def _load_command_class(specification):
+    # <module or path>:<class name>
+    location, _, class_name = specification.rpartition(':')
+    if location.endswith('.py'):
+        sys.path.insert(0, os.path.dirname(os.path.abspath(location)))
+        module_name = os.path.splitext(os.path.basename(location))[0]
+    else:
+        module_name = location
+    module = __import__(module_name, fromlist=[class_name])
+    return getattr(module, class_name)
+
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+_header = re.compile(br'chunked\s+1.0\s*,\s*(\d+)\s*,\s*(\d+)\s*\n')
+
+# endregion
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Replays a recorded search command session')
+    parser.add_argument('command', help='search command class as <module or path to .py file>:<class name>')
+    parser.add_argument('recording', help='recording path without the .input.gz suffix')
+    parser.add_argument('--memory', action='store_true', help='measure the peak memory allocated by Python')
+    args = parser.parse_args(argv)
+
+    report = replay(_load_command_class(args.command), args.recording, trace_memory=args.memory)
+    print(report)
+    return 1 if report.differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
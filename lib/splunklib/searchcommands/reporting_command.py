@@ -99,12 +99,31 @@ class ReportingCommand(SearchCommand):
     def reduce(self, records):
         """ Override this method to produce a reporting data structure.
 
-        You must override this method.
+        You must override this method or :meth:`reduce_batch`.
 
         """
         raise NotImplementedError('reduce(self, records)')
 
+    def reduce_batch(self, columns):
+        """ Override this method to produce a reporting data structure from a batch of records.
+
+        :param columns: Mapping from fieldname to the list of values of that field. Missing values are :const:`None`.
+        :type columns: OrderedDict
+
+        :return: Mapping from fieldname to a list of values. All lists must be of the same length.
+        :rtype: dict or NoneType
+
+        You may override this method instead of :meth:`reduce`. It is then called once for each chunk of records
+        rather than record by record.
+
+        """
+        raise NotImplementedError('reduce_batch(self, columns)')
+
     def _execute(self, ifile, process):
+        if self.phase == 'reduce' and type(self).reduce_batch != ReportingCommand.reduce_batch:
+            self._columnar = True
+            SearchCommand._execute(self, ifile, self.reduce_batch)
+            return
         SearchCommand._execute(self, ifile, getattr(self, self.phase))
 
     # endregion
@@ -232,7 +251,7 @@ class ReportingCommand(SearchCommand):
             """ Verifies :code:`command` class structure and configures the :code:`command.map` method.
 
             Verifies that :code:`command` derives from :class:`ReportingCommand` and overrides
-            :code:`ReportingCommand.reduce`. It then configures :code:`command.reduce`, if an overriding implementation
+            :code:`ReportingCommand.reduce` or :code:`ReportingCommand.reduce_batch`. It then configures :code:`command.reduce`, if an overriding implementation
             of :code:`ReportingCommand.reduce` has been provided.
 
             :param command: :code:`ReportingCommand` class
@@ -246,7 +265,7 @@ class ReportingCommand(SearchCommand):
             if not issubclass(command, ReportingCommand):
                 raise TypeError('{} is not a ReportingCommand'.format( command))
 
-            if command.reduce == ReportingCommand.reduce:
+            if command.reduce == ReportingCommand.reduce and command.reduce_batch == ReportingCommand.reduce_batch:
                 raise AttributeError('No ReportingCommand.reduce override')
 
             if command.map == ReportingCommand.map:
@@ -27,24 +27,19 @@ try:
 except ImportError:
     from ..ordereddict import OrderedDict
 from copy import deepcopy
+from functools import partial
 from splunklib.six.moves import StringIO
 from itertools import chain, islice
-from splunklib.six.moves import filter as ifilter, map as imap, zip as izip
+from splunklib.six.moves import filter as ifilter, map as imap, zip as izip, zip_longest as izip_longest
 from splunklib import six
 if six.PY2:
     from logging import _levelNames, getLevelName, getLogger
 else:
     from logging import _nameToLevel as _levelNames, getLevelName, getLogger
-try:
-    from shutil import make_archive
-except ImportError:
-    # Used for recording, skip on python 2.6
-    pass
 from time import time
 from splunklib.six.moves.urllib.parse import unquote
 from splunklib.six.moves.urllib.parse import urlsplit
 from warnings import warn
-from xml.etree import ElementTree
 
 import os
 import sys
@@ -56,20 +51,28 @@ import traceback
 # Relative imports
 
 from .internals import (
+    ChunkBuffer,
     CommandLineParser,
+    CompactRecord,
     CsvDialect,
     InputHeader,
-    Message,
+    MemoryViewReader,
     MetadataDecoder,
     MetadataEncoder,
     ObjectView,
+    PipelinedChunkReader,
+    PipelinedRecordWriter,
     Recorder,
     RecordWriterV1,
     RecordWriterV2,
+    SearchResultsInfo,
     json_encode_string)
 
 from . import Boolean, Option, environment
-from ..client import Service
+from .multivalue import decode_multivalue
+
+# Modules that are only needed by some invocations--the service object, recordings, vix families--are imported where
+# they are first used. This keeps them off the startup path that every search command pays for on every invocation.
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -117,11 +120,14 @@ class SearchCommand(object):
         self._options = None
         self._protocol_version = None
         self._search_results_info = None
+        self._search_results_info_key = None
         self._service = None
 
         # Internal variables
 
+        self._columnar = False
         self._default_logging_level = self._logger.level
+        self._pipelined_writer = None
         self._record_writer = None
         self._records = None
 
@@ -172,6 +178,21 @@ class SearchCommand(object):
                 raise ValueError('Unrecognized logging level: {}'.format(value))
         self._logger.setLevel(level)
 
+    # Set to True in a derived class to overlap decoding, processing, and encoding of records under SCP v2. Records
+    # are then decoded and encoded on background threads.
+    pipelined = False
+
+    # Set to True in a derived class to read input records as CompactRecord instances instead of OrderedDict
+    # instances. All records of a chunk then share a single schema.
+    compact_records = False
+
+    # Set to a number of bytes in a derived class to bound the size of the output buffer. Under SCP v2 records beyond
+    # that size are sent as unfinished chunks, once splunkd has sent all of its input. Before that the protocol offers no
+    # way to send output ahead of the response to the current chunk, so the buffer grows with the output for that chunk
+    # regardless of this setting. The bound holds only for output written in response to the final chunk, which is
+    # where reporting commands write most of theirs.
+    max_buffer_size = None
+
     record = Option(doc='''
         **Syntax: record=<bool>
 
@@ -221,6 +242,19 @@ class SearchCommand(object):
             'Please use SearchCommand.metadata instead.', DeprecationWarning, 2)
         return self._input_header
 
+    @property
+    def input_finished(self):
+        """ Indicates whether the records being processed are the last ones splunkd sends.
+
+        Under SCP v2 input arrives in chunks, and :meth:`flush` can only send records ahead of the response to the
+        final one. The final chunk is processed even if it holds no records. Under SCP v1 all input arrives at once,
+        so this is always :const:`True`.
+
+        :rtype: bool
+
+        """
+        return self._protocol_version != 2 or bool(self._finished)
+
     @property
     def logger(self):
         """ Returns the logger for this command.
@@ -253,16 +287,13 @@ class SearchCommand(object):
         """ Returns the search results info for this command invocation.
 
         The search results info object is created from the search results info file associated with the command
-        invocation.
+        invocation. Its fields are decoded on first access. The object is reused until the file changes.
 
         :return: Search results info:const:`None`, if the search results info file associated with the command
                  invocation is inaccessible.
         :rtype: SearchResultsInfo or NoneType
 
         """
-        if self._search_results_info is not None:
-            return self._search_results_info
-
         if self._protocol_version == 1:
             try:
                 path = self._input_header['infoPath']
@@ -278,55 +309,29 @@ class SearchCommand(object):
 
             path = os.path.join(dispatch_dir, 'info.csv')
 
+        # Splunk rewrites the file while a search runs, so the cached info is good for as long as the file is unchanged
+
         try:
-            with io.open(path, 'r') as f:
-                reader = csv.reader(f, dialect=CsvDialect)
-                fields = next(reader)
-                values = next(reader)
-        except IOError as error:
+            stat = os.stat(path)
+        except OSError as error:
             if error.errno == 2:
                 self.logger.error('Search results info file {} does not exist.'.format(json_encode_string(path)))
                 return
             raise
 
-        def convert_field(field):
-            return (field[1:] if field[0] == '_' else field).replace('.', '_')
-
-        decode = MetadataDecoder().decode
-
-        def convert_value(value):
-            try:
-                return decode(value) if len(value) > 0 else value
-            except ValueError:
-                return value
-
-        info = ObjectView(dict(imap(lambda f_v: (convert_field(f_v[0]), convert_value(f_v[1])), izip(fields, values))))
-
-        try:
-            count_map = info.countMap
-        except AttributeError:
-            pass
-        else:
-            count_map = count_map.split(';')
-            n = len(count_map)
-            info.countMap = dict(izip(islice(count_map, 0, n, 2), islice(count_map, 1, n, 2)))
+        key = path, stat.st_mtime, stat.st_size
 
-        try:
-            msg_type = info.msgType
-            msg_text = info.msg
-        except AttributeError:
-            pass
-        else:
-            messages = ifilter(lambda t_m: t_m[0] or t_m[1], izip(msg_type.split('\n'), msg_text.split('\n')))
-            info.msg = [Message(message) for message in messages]
-            del info.msgType
+        if self._search_results_info is not None and self._search_results_info_key == key:
+            return self._search_results_info
 
-        try:
-            info.vix_families = ElementTree.fromstring(info.vix_families)
-        except AttributeError:
-            pass
+        with io.open(path, 'r') as f:
+            reader = csv.reader(f, dialect=CsvDialect)
+            fields = next(reader)
+            values = next(reader)
 
+        info = SearchResultsInfo(fields, values)
         self._search_results_info = info
+        self._search_results_info_key = key
         return info
 
     @property
@@ -368,6 +373,8 @@ class SearchCommand(object):
         if splunkd_uri is None:
             return None
 
+        from ..client import Service
+
         uri = urlsplit(splunkd_uri, allow_fragments=False)
 
         self._service = Service(
@@ -395,9 +402,15 @@ class SearchCommand(object):
     def flush(self):
         """ Flushes the output buffer.
 
+        Under SCP v2 records written so far are sent to splunkd as an unfinished chunk, once splunkd has sent all of
+        its input (see :attr:`input_finished`). Before that the output buffer is sent along with the response to the
+        current chunk.
+
         :return: :const:`None`
 
         """
+        if self._pipelined_writer is not None:
+            self._pipelined_writer.drain()
         self._record_writer.flush(finished=False)
 
     def prepare(self):
@@ -561,6 +574,7 @@ class SearchCommand(object):
         dispatch_dir = self._metadata.searchinfo.dispatch_dir
 
         if dispatch_dir is not None:  # __GETINFO__ action does not include a dispatch_dir
+            from shutil import make_archive
             root_dir, base_dir = os.path.split(dispatch_dir)
             make_archive(recording + '.dispatch_dir', 'gztar', root_dir, base_dir, logger=self.logger)
 
@@ -581,7 +595,7 @@ class SearchCommand(object):
         class_name = self.__class__.__name__
 
         debug('%s.process started under protocol_version=1', class_name)
-        self._record_writer = RecordWriterV1(ofile)
+        self._record_writer = RecordWriterV1(ofile, max_buffer_size=self.max_buffer_size)
 
         # noinspection PyBroadException
         try:
@@ -693,7 +707,8 @@ class SearchCommand(object):
         # Write search command configuration for consumption by splunkd
         # noinspection PyBroadException
         try:
-            self._record_writer = RecordWriterV2(ofile, getattr(self._metadata.searchinfo, 'maxresultrows', None))
+            self._record_writer = RecordWriterV2(
+                ofile, getattr(self._metadata.searchinfo, 'maxresultrows', None), self.max_buffer_size)
             self.fieldnames = []
             self.options.reset()
 
@@ -789,19 +804,19 @@ class SearchCommand(object):
         debug('%s.process completed', class_name)
 
     def write_debug(self, message, *args):
-        self._record_writer.write_message('DEBUG', message, *args)
+        self._call_record_writer('write_message', 'DEBUG', message, *args)
 
     def write_error(self, message, *args):
-        self._record_writer.write_message('ERROR', message, *args)
+        self._call_record_writer('write_message', 'ERROR', message, *args)
 
     def write_fatal(self, message, *args):
-        self._record_writer.write_message('FATAL', message, *args)
+        self._call_record_writer('write_message', 'FATAL', message, *args)
 
     def write_info(self, message, *args):
-        self._record_writer.write_message('INFO', message, *args)
+        self._call_record_writer('write_message', 'INFO', message, *args)
 
     def write_warning(self, message, *args):
-        self._record_writer.write_message('WARN', message, *args)
+        self._call_record_writer('write_message', 'WARN', message, *args)
 
     def write_metric(self, name, value):
         """ Writes a metric that will be added to the search inspector.
@@ -822,15 +837,18 @@ class SearchCommand(object):
         :return: :const:`None`.
 
         """
-        self._record_writer.write_metric(name, value)
+        self._call_record_writer('write_metric', name, value)
 
-    # P2 [ ] TODO: Support custom inspector values
+    def _call_record_writer(self, name, *args):
+        # While records are written on a background thread, the record writer must not be changed on this one
+        if self._pipelined_writer is None:
+            getattr(self._record_writer, name)(*args)
+        else:
+            self._pipelined_writer.call(name, *args)
 
-    @staticmethod
-    def _decode_list(mv):
-        return [match.replace('$$', '$') for match in SearchCommand._encoded_value.findall(mv)]
+    # P2 [ ] TODO: Support custom inspector values
 
-    _encoded_value = re.compile(r'\$(?P<item>(?:\$\$|[^$])*)\$(?:;|$)')  # matches a single value in an encoded list
+    _decode_list = staticmethod(decode_multivalue)
 
     # Note: Subclasses must override this method so that it can be called
     # called as self._execute(ifile, None)
@@ -848,11 +866,17 @@ class SearchCommand(object):
 
         """
         if self.protocol_version == 1:
-            self._record_writer.write_records(process(self._records(ifile)))
+            if self._columnar:
+                self._record_writer.write_columns(process(self._read_csv_columns(ifile)))
+            else:
+                self._record_writer.write_records(process(self._records(ifile)))
             self.finish()
         else:
             assert self._protocol_version == 2
-            self._execute_v2(ifile, process)
+            if self.pipelined and not self._columnar:
+                self._execute_v2_pipelined(ifile, process)
+            else:
+                self._execute_v2(ifile, process)
 
     @staticmethod
     def _as_binary_stream(ifile):
@@ -866,7 +890,21 @@ class SearchCommand(object):
             raise RuntimeError('Failed to get underlying buffer: {}'.format(error))
 
     @staticmethod
-    def _read_chunk(istream):
+    def _as_text_stream(body):
+        if isinstance(body, memoryview):
+            if six.PY2:
+                return StringIO(body.tobytes())
+            return io.TextIOWrapper(MemoryViewReader(body), encoding='utf-8', newline='')
+        return StringIO(body)
+
+    @staticmethod
+    def _read_chunk(istream, buffer=None):
+        """ Reads a chunk from :code:`istream`.
+
+        The body of the chunk is returned as a string or--if a :class:`ChunkBuffer` is given--as a :class:`memoryview`
+        on that buffer. The view is valid until the next chunk is read into the buffer.
+
+        """
         # noinspection PyBroadException
         assert isinstance(istream.read(0), six.binary_type), 'Stream must be binary'
 
@@ -905,11 +943,11 @@ class SearchCommand(object):
         body = ""
         try:
             if body_length > 0:
-                body = istream.read(body_length)
+                body = istream.read(body_length) if buffer is None else buffer.read(istream, body_length)
         except Exception as error:
             raise RuntimeError('Failed to read body of length {}: {}'.format(body_length, error))
 
-        return metadata, six.ensure_str(body)
+        return metadata, six.ensure_str(body) if buffer is None else body
 
     _header = re.compile(r'chunked\s+1.0\s*,\s*(\d+)\s*,\s*(\d+)\s*\n')
 
@@ -926,26 +964,124 @@ class SearchCommand(object):
 
         mv_fieldnames = dict([(name, name[len('__mv_'):]) for name in fieldnames if name.startswith('__mv_')])
 
+        if self.compact_records:
+            for record in self._read_compact_records(reader, fieldnames, mv_fieldnames):
+                yield record
+            return
+
         if len(mv_fieldnames) == 0:
             for values in reader:
                 yield OrderedDict(izip(fieldnames, values))
             return
 
+        # The multivalue field plan: (fieldname, name of the field decoded from it or None) for each column
+        plan = [(fieldname, mv_fieldnames.get(fieldname)) for fieldname in fieldnames]
+
         for values in reader:
             record = OrderedDict()
-            for fieldname, value in izip(fieldnames, values):
-                if fieldname.startswith('__mv_'):
+            for (fieldname, mv_fieldname), value in izip(plan, values):
+                if mv_fieldname is not None:
                     if len(value) > 0:
-                        record[mv_fieldnames[fieldname]] = self._decode_list(value)
+                        record[mv_fieldname] = self._decode_list(value)
                 elif fieldname not in record:
                     record[fieldname] = value
             yield record
 
+    def _read_csv_columns(self, ifile):
+        """ Reads all records from :code:`ifile` as a mapping from fieldname to a list of values.
+
+        Missing values are represented by :const:`None`. This includes the values of rows shorter than the header.
+
+        """
+        reader = csv.reader(ifile, dialect=CsvDialect)
+
+        try:
+            fieldnames = next(reader)
+        except StopIteration:
+            return OrderedDict()
+
+        n = len(fieldnames)
+        values = list(izip_longest(*reader, fillvalue=None))
+        values = [list(column) for column in islice(values, 0, n)]
+        values += [[] for _ in range(n - len(values))]  # no records at all
+
+        columns = OrderedDict()
+        mv_columns = []
+
+        for fieldname, column in izip(fieldnames, values):
+            if fieldname.startswith('__mv_'):
+                mv_columns.append((fieldname[len('__mv_'):], column))
+            elif fieldname not in columns:
+                columns[fieldname] = column
+
+        decode_list = self._decode_list
+
+        for fieldname, mv_column in mv_columns:
+            column = columns.get(fieldname)
+            if column is None:
+                columns[fieldname] = [decode_list(value) if value else None for value in mv_column]
+            else:
+                columns[fieldname] = [
+                    decode_list(mv_value) if mv_value else value for value, mv_value in izip(column, mv_column)]
+
+        return columns
+
+    def _read_compact_records(self, reader, fieldnames, mv_fieldnames):
+
+        names = []
+        index = {}
+
+        for fieldname in fieldnames:
+            name = mv_fieldnames.get(fieldname, fieldname)
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+
+        schema = (names, index)
+        missing = CompactRecord.missing  # pads short rows, so their trailing fields are absent as in the dict path
+        n = len(fieldnames)
+
+        if len(mv_fieldnames) == 0 and len(names) == n:
+            for values in reader:
+                if len(values) != n:
+                    values = (values + [missing] * n)[:n]
+                yield CompactRecord(schema, values)
+            return
+
+        # The multivalue field plan: for each field its value column and the column of its encoded values, if any.
+        # An encoded list takes precedence over the value, if it is not empty.
+        value_columns = [None] * len(names)
+        mv_columns = [None] * len(names)
+
+        for column, fieldname in enumerate(fieldnames):
+            if fieldname in mv_fieldnames:
+                mv_columns[index[mv_fieldnames[fieldname]]] = column
+            elif value_columns[index[fieldname]] is None:
+                value_columns[index[fieldname]] = column
+
+        plan = list(izip(value_columns, mv_columns))
+        decode_list = self._decode_list
+
+        for values in reader:
+            if len(values) < n:
+                values = values + [missing] * (n - len(values))
+            record = []
+            for value_column, mv_column in plan:
+                mv_value = missing if mv_column is None else values[mv_column]
+                if mv_value is not missing and len(mv_value) > 0:
+                    record.append(decode_list(mv_value))
+                elif value_column is not None:
+                    record.append(values[value_column])
+                else:
+                    record.append(missing)
+            yield CompactRecord(schema, record)
+
     def _execute_v2(self, ifile, process):
         istream = self._as_binary_stream(ifile)
+        buffer = ChunkBuffer()
 
         while True:
-            result = self._read_chunk(istream)
+            result = self._read_chunk(istream, buffer)
 
             if not result:
                 return
@@ -957,18 +1093,88 @@ class SearchCommand(object):
 
             self._finished = getattr(metadata, 'finished', False)
             self._record_writer.is_flushed = False
+            self._record_writer.continuation = partial(self._read_continuation, istream) if self._finished else None
 
             self._execute_chunk_v2(process, result)
 
+            self._record_writer.continuation = None
             self._record_writer.write_chunk(finished=self._finished)
 
+    def _execute_v2_pipelined(self, ifile, process):
+        # Splunkd sends the next chunk only after it received our response to the current one. Hence chunks are
+        # processed one after another, while the records within a chunk are decoded, processed, and encoded
+        # concurrently.
+        istream = self._as_binary_stream(ifile)
+        reader = PipelinedChunkReader(
+            istream, partial(self._read_chunk, buffer=ChunkBuffer()), self._read_csv_records, self._as_text_stream)
+        self._pipelined_writer = writer = PipelinedRecordWriter(self._record_writer)
+
+        try:
+            while True:
+                result = reader.read_chunk()
+
+                if not result:
+                    break
+
+                metadata, records = result
+                action = getattr(metadata, 'action', None)
+                if action != 'execute':
+                    raise RuntimeError('Expected execute action, not {}'.format(action))
+
+                # The reader stops reading, once it has read the final chunk of input. Hence we may read the requests
+                # following unfinished chunks ourselves.
+                self._finished = getattr(metadata, 'finished', False)
+                self._record_writer.is_flushed = False
+                self._record_writer.continuation = partial(self._read_continuation, istream) if self._finished else None
+
+                if records is None and self._finished:
+                    records = iter(())
+
+                if records is not None:
+                    writer.write_records(process(records))
+                    writer.drain()
+
+                self._record_writer.continuation = None
+                self._record_writer.write_chunk(finished=self._finished)
+        finally:
+            self._pipelined_writer = None
+            writer.close()
+
+        # Requests following the final chunk of input carry no data
+        self._execute_v2(ifile, process)
+
+    def _read_continuation(self, istream):
+        # Reads the empty request splunkd sends after we wrote an unfinished chunk of output
+        result = self._read_chunk(istream)
+
+        if not result:
+            raise RuntimeError('Expected execute action, not end of input')
+
+        metadata, body = result
+        action = getattr(metadata, 'action', None)
+
+        if action != 'execute':
+            raise RuntimeError('Expected execute action, not {}'.format(action))
+
+        if len(body) > 0:
+            raise RuntimeError('Did not expect data after all input has been received')
+
+        self._record_writer.is_flushed = False
+
     def _execute_chunk_v2(self, process, chunk):
             metadata, body = chunk
 
-            if len(body) <= 0:
+            # The final chunk is processed even without records, so that commands deferring work until
+            # input_finished get to do it
+            if len(body) <= 0 and not self._finished:
+                return
+
+            if self._columnar:
+                columns = self._read_csv_columns(self._as_text_stream(body))
+                self._record_writer.write_columns(process(columns))
                 return
 
-            records = self._read_csv_records(StringIO(body))
+            records = self._read_csv_records(self._as_text_stream(body))
             self._record_writer.write_records(process(records))
 
 
@@ -51,7 +51,26 @@ class StreamingCommand(SearchCommand):
         """
         raise NotImplementedError('StreamingCommand.stream(self, records)')
 
+    def stream_batch(self, columns):
+        """ Processes a batch of event records and returns the batch to pass along the Splunk stream pipeline.
+
+        :param columns: Mapping from fieldname to the list of values of that field. Missing values are :const:`None`.
+        :type columns: OrderedDict
+
+        :return: Mapping from fieldname to a list of values. All lists must be of the same length.
+        :rtype: dict or NoneType
+
+        You may override this method instead of :meth:`stream`. It is then called once for each chunk of records
+        rather than record by record.
+
+        """
+        raise NotImplementedError('StreamingCommand.stream_batch(self, columns)')
+
     def _execute(self, ifile, process):
+        if type(self).stream_batch != StreamingCommand.stream_batch:
+            self._columnar = True
+            SearchCommand._execute(self, ifile, self.stream_batch)
+            return
         SearchCommand._execute(self, ifile, self.stream)
 
     # endregion
@@ -169,7 +188,7 @@ class StreamingCommand(SearchCommand):
             """ Verifies :code:`command` class structure.
 
             """
-            if command.stream == StreamingCommand.stream:
+            if command.stream == StreamingCommand.stream and command.stream_batch == StreamingCommand.stream_batch:
                 raise AttributeError('No StreamingCommand.stream override')
             return
 
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Tests of the __mv_ multivalue codec in splunklib.searchcommands.multivalue.
+
+    python -m pytest tests
+"""
+
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+from splunklib.searchcommands.multivalue import decode_multivalue, encode_multivalue
+
+# The decoder splunklib used before the codec module, see SearchCommand._decode_list in the baseline
+_old_encoded_value = re.compile(r'\$(?P<item>(?:\$\$|[^$])*)\$(?:;|$)')
+
+
+def old_decode_multivalue(mv):
+    return [match.replace('$$', '$') for match in _old_encoded_value.findall(mv)]
+
+
+def old_encode_multivalue(values):
+    sv = ''
+    mv = '$'
+    for value in values:
+        if value is None:
+            sv += '\n'
+            mv += '$;$'
+            continue
+        sv += value + '\n'
+        mv += value.replace('$', '$$') + '$;$'
+    return sv[:-1], mv[:-2]
+
+
+def random_values(rng):
+    alphabet = 'ab$;\n ä€'
+    return [
+        None if rng.random() < 0.1 else ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+        for _ in range(rng.randint(2, 8))
+    ]
+
+
+class TestMultivalue(unittest.TestCase):
+
+    def test_round_trip(self):
+        rng = random.Random(20261019)
+        for _ in range(20000):
+            values = random_values(rng)
+            sv, mv = encode_multivalue(values)
+            expected = ['' if value is None else value for value in values]
+            self.assertEqual(decode_multivalue(mv), expected, mv)
+            self.assertEqual(sv, '\n'.join(expected))
+
+    def test_matches_old_codec(self):
+        rng = random.Random(4711)
+        for _ in range(20000):
+            values = random_values(rng)
+            self.assertEqual(encode_multivalue(values), old_encode_multivalue(values))
+            mv = encode_multivalue(values)[1]
+            self.assertEqual(decode_multivalue(mv), old_decode_multivalue(mv), mv)
+
+    def test_examples(self):
+        self.assertEqual(encode_multivalue(['a', 'b$c']), ('a\nb$c', '$a$;$b$$c$'))
+        self.assertEqual(decode_multivalue('$a$;$b$$c$'), ['a', 'b$c'])
+        self.assertEqual(decode_multivalue('$$'), [''])
+        self.assertEqual(decode_multivalue('$$$$$$'), ['$$'])
+        self.assertEqual(decode_multivalue(''), [])
+
+    def test_malformed(self):
+        # A lone $ inside a value can't be produced by the encoder. The old decoder dropped what preceded it, the
+        # codec keeps it as part of the value. See decode_multivalue.
+        self.assertEqual(decode_multivalue('$a$a$'), ['a$a'])
+        self.assertEqual(old_decode_multivalue('$a$a$'), ['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()